@@ -4,14 +4,19 @@ import threading
 
 import dearpygui.dearpygui as dpg
 
-from Code.handlers import ModManager
+from Code.handlers import ModManager, PartsManager
+from Code.package import IdLoader
+
+from .mods_tab import ModsTab
 
 
 class App:
     @staticmethod
     def run() -> None:
         try:
-            dpg.start_dearpygui()
+            while dpg.is_dearpygui_running():
+                ModsTab.on_frame()
+                dpg.render_dearpygui_frame()
 
         except Exception as e:
             logging.error(f"Error during running GUI: {e}")
@@ -19,6 +24,11 @@ class App:
         finally:
             logging.debug("Destroying app...")
 
+            # Idle pool workers are non-daemon threads, each one would cost
+            # the join below its full timeout.
+            IdLoader.shutdown()
+            PartsManager.shutdown()
+
             active_threads = [
                 t
                 for t in threading.enumerate()
@@ -33,6 +43,9 @@ class App:
             except Exception as e:
                 logging.error(f"Error saving mods during shutdown: {e}")
 
+            IdLoader.shutdown()
+            PartsManager.shutdown()
+
             gc.collect()
             logging.debug("Starting final cleanup...")
 
@@ -1,9 +1,10 @@
 import logging
+import time
 
 import dearpygui.dearpygui as dpg
 
 from Code.app_vars import AppConfig
-from Code.handlers import ModManager
+from Code.handlers import ModManager, SortResult
 from Code.loc import Localization as loc
 from Code.package import ModUnit
 
@@ -12,6 +13,9 @@ class ModsTab:
     dragged_mod_id = None
     active_mod_search_text = ""
     inactive_mod_search_text = ""
+    last_render_time = 0.0
+    # Active mods whose errors wait for their ids, see render_mods()
+    ids_pending = 0
 
     @staticmethod
     def create():
@@ -27,6 +31,16 @@ class ModsTab:
                 with dpg.tooltip("sort_button"):
                     dpg.add_text(loc.get_string("btn-sort-mods-desc"))
 
+                dpg.add_button(
+                    label=loc.get_string("btn-rescan-mods"),
+                    callback=ModsTab.rescan_mods,
+                    tag="rescan_button",
+                )
+                with dpg.tooltip("rescan_button"):
+                    dpg.add_text(loc.get_string("btn-rescan-mods-desc"))
+
+            dpg.add_progress_bar(tag="mod_load_progress", width=-1, show=False)
+
             with dpg.group(horizontal=True):
                 dpg.add_text(
                     loc.get_string("label-directory-found"), color=(100, 150, 250)
@@ -103,8 +117,46 @@ class ModsTab:
                     ):
                         pass
 
+        ModsTab.update_load_progress()
         ModsTab.render_mods()
 
+    @staticmethod
+    def on_frame():
+        changed = ModManager.drain_loaded()
+        if changed:
+            ModsTab.update_load_progress()
+
+        elif not ModsTab.ids_pending:
+            return
+
+        # Rebuilding both lists every frame would stall the GUI, while mods
+        # are still arriving or their ids still loading they are redrawn a
+        # few times a second.
+        now = time.monotonic()
+        if (
+            ModManager.is_loading() or not changed
+        ) and now - ModsTab.last_render_time < 0.3:
+            return
+
+        ModsTab.last_render_time = now
+        if not changed and ModManager.count_ids_pending() == ModsTab.ids_pending:
+            return
+
+        ModsTab.render_mods()
+
+    @staticmethod
+    def update_load_progress():
+        loading = ModManager.is_loading()
+        done, total = ModManager.get_load_progress()
+        dpg.configure_item(
+            "mod_load_progress",
+            show=loading,
+            default_value=done / total if total else 0.0,
+            overlay=loc.get_string("loading-count", done=done, total=total),
+        )
+        dpg.configure_item("sort_button", enabled=not loading)
+        dpg.configure_item("rescan_button", enabled=not loading)
+
     @staticmethod
     def on_search_changed(sender, app_data, user_data):
         if user_data == "active":
@@ -117,7 +169,12 @@ class ModsTab:
 
     @staticmethod
     def render_mods():
-        ModManager.process_errors()
+        # Errors need every active mod, they wait for the end of loading.
+        # Mods whose ids are still loading get theirs from a later on_frame.
+        ModsTab.ids_pending = (
+            0 if ModManager.is_loading() else ModManager.process_errors()
+        )
+
         dpg.delete_item("active_mods_child", children_only=True)
         for mod in ModManager.active_mods:
             if ModsTab.active_mod_search_text in mod.name.lower():
@@ -329,6 +386,9 @@ class ModsTab:
 
     @staticmethod
     def on_mod_dropped(sender, app_data, user_data):
+        if ModManager.is_loading():
+            return
+
         drag_data = app_data
         dragged_mod_id = drag_data["mod_id"]
         dragged_mod_status = drag_data["status"]
@@ -370,7 +430,52 @@ class ModsTab:
 
     @staticmethod
     def sort_active_mods():
-        ModManager.sort()
+        result = ModManager.sort()
+        ModsTab.render_mods()
+        if not result.success:
+            ModsTab.show_sort_failure(result)
+
+    @staticmethod
+    def show_sort_failure(result: SortResult):
+        window_tag = "sort_failure_window"
+        if dpg.does_item_exist(window_tag):
+            dpg.delete_item(window_tag)
+
+        def mod_name(mod_id: str) -> str:
+            mod = ModManager.get_mod_by_id(mod_id)
+            return mod.name if mod else mod_id
+
+        with dpg.window(
+            label=loc.get_string("label-sort-failed-title"),
+            width=600,
+            height=300,
+            tag=window_tag,
+            on_close=lambda: dpg.delete_item(window_tag),
+        ):
+            dpg.add_text(loc.get_string("label-sort-cycles"), color=[255, 0, 0])
+            for cycle in result.cycles:
+                for before, after, kind in cycle.edges:
+                    dpg.add_text(
+                        loc.get_string(
+                            "sort-cycle-edge",
+                            before=mod_name(before),
+                            after=mod_name(after),
+                            kind=kind,
+                        ),
+                        wrap=0,
+                        bullet=True,
+                    )
+                dpg.add_separator()
+
+            if result.blocked_ids:
+                dpg.add_text(loc.get_string("label-sort-blocked"), color=[255, 255, 0])
+                for mod_id in result.blocked_ids:
+                    dpg.add_text(mod_name(mod_id), wrap=0, bullet=True)
+
+    @staticmethod
+    def rescan_mods():
+        ModManager.start_loading(rescan=True)
+        ModsTab.update_load_progress()
         ModsTab.render_mods()
 
     @staticmethod
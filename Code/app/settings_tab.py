@@ -144,8 +144,9 @@ class SettingsTab:
                 AppConfig.set_steam_mods_path()
                 logger.info(f"Valid path set: {path}")
 
-                ModManager.load_mods()
+                ModManager.start_loading()
                 ModManager.load_cslua_config()
+                ModsTab.update_load_progress()
                 ModsTab.render_mods()
                 return
             else:
@@ -81,6 +81,10 @@ class AppConfig:
     def get_data_root_path(cls) -> Path:
         return cls._data_root
 
+    @classmethod
+    def get_user_data_path(cls) -> Path:
+        return cls._user_data_path
+
     @classmethod
     def get_game_path(cls) -> Optional[Path]:
         game_path = cls.user_config.get("barotrauma_dir")
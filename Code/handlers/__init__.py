@@ -1,2 +1,4 @@
-from .condition_manager import process_condition
+from .condition_manager import compile_condition, process_condition
+from .dependency_graph import SortCycle, SortResult
 from .mod_manager import ModManager
+from .parts_manager import PartsManager
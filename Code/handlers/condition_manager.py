@@ -1,96 +1,110 @@
 import re
-from typing import Callable, Dict, List, Optional
+from functools import lru_cache
+from typing import AbstractSet, Callable, Dict, List, Optional, Union
 
-condition_handlers: Dict[str, Callable[..., bool]] = {}
+from Code.package import ModIdSet
+
+# A compiled condition, evaluated against the ids of the active mods.
+Condition = Callable[[ModIdSet], bool]
+
+# "ifhas(" -> factory turning the text between the parentheses into a Condition
+condition_handlers: Dict[str, Callable[[str], Condition]] = {}
+
+_TOKEN_REGEX = re.compile(r"\(|\)|\w+\(.*?\)|&|\|")
+_PRECEDENCE = {"&": 2, "|": 1}
 
 
 def register_condition_handler(prefix: str):
-    def decorator(func: Callable[..., bool]):
+    def decorator(func: Callable[[str], Condition]):
         condition_handlers[prefix] = func
+        compile_condition.cache_clear()
         return func
 
     return decorator
 
 
-def process_condition(condition: Optional[str], **kwargs) -> bool:
-    if not condition:
-        return False
+def _compile_single(cond: str) -> Condition:
+    cond = cond.strip()
+    handler = None
+    if cond.endswith(")"):
+        handler = condition_handlers.get(cond[: cond.find("(") + 1])
+
+    if handler is None:
+
+        def unknown(active_mod_ids: ModIdSet) -> bool:
+            raise ValueError(f"Unknown condition format: {cond}")
 
-    def eval_single(cond: str) -> bool:
-        cond = cond.strip()
-        for prefix, handler in condition_handlers.items():
-            if cond.startswith(prefix) and cond.endswith(")"):
-                inner_context = cond[len(prefix) : -1].strip()
-                return handler(inner_context, **kwargs)
+        return unknown
 
-        raise ValueError(f"Unknown condition format: {cond}")
+    return handler(cond[cond.find("(") + 1 : -1].strip())
 
-    def precedence(op: str) -> int:
-        return {"&": 2, "|": 1}.get(op, 0)
 
-    def apply_operator(
-        op: str, left: Callable[[], bool], right: Callable[[], bool]
-    ) -> bool:
-        if op == "&":
-            return left() and right()
+def _combine(op: str, left: Condition, right: Condition) -> Condition:
+    if op == "&":
+        return lambda active_mod_ids: left(active_mod_ids) and right(active_mod_ids)
 
-        if op == "|":
-            return left() or right()
+    if op == "|":
+        return lambda active_mod_ids: left(active_mod_ids) or right(active_mod_ids)
 
-        raise ValueError(f"Unsupported operator: {op}")
+    raise ValueError(f"Unsupported operator: {op}")
 
-    def process_expression(tokens: List[str]) -> bool:
-        values: List[Callable[[], bool]] = []
-        operators: List[str] = []
 
-        for token in tokens:
-            token = token.strip()
-            if not token:
-                continue
+def _reduce(values: List[Condition], operators: List[str]) -> None:
+    op = operators.pop()
+    right = values.pop()
+    left = values.pop()
+    values.append(_combine(op, left, right))
 
-            if token == "(":
-                operators.append(token)
 
-            elif token == ")":
-                while operators and operators[-1] != "(":
-                    op = operators.pop()
-                    right = values.pop()
-                    left = values.pop()
-                    values.append(lambda l=left, r=right, o=op: apply_operator(o, l, r))  # noqa: E741
+@lru_cache(maxsize=4096)
+def compile_condition(condition: str) -> Condition:
+    values: List[Condition] = []
+    operators: List[str] = []
 
-                operators.pop()
+    for token in _TOKEN_REGEX.findall(condition.replace(" ", "")):
+        if token == "(":
+            operators.append(token)
 
-            elif token in ("&", "|"):
-                while (
-                    operators
-                    and operators[-1] != "("
-                    and precedence(operators[-1]) >= precedence(token)
-                ):
-                    op = operators.pop()
-                    right = values.pop()
-                    left = values.pop()
-                    values.append(lambda l=left, r=right, o=op: apply_operator(o, l, r))  # noqa: E741
+        elif token == ")":
+            while operators and operators[-1] != "(":
+                _reduce(values, operators)
 
-                operators.append(token)
+            operators.pop()
 
-            else:
-                values.append(lambda t=token: eval_single(t))
+        elif token in _PRECEDENCE:
+            while (
+                operators
+                and operators[-1] != "("
+                and _PRECEDENCE.get(operators[-1], 0) >= _PRECEDENCE[token]
+            ):
+                _reduce(values, operators)
 
-        while operators:
-            op = operators.pop()
-            right = values.pop()
-            left = values.pop()
-            values.append(lambda l=left, r=right, o=op: apply_operator(o, l, r))  # noqa: E741
+            operators.append(token)
+
+        else:
+            values.append(_compile_single(token))
+
+    while operators:
+        _reduce(values, operators)
+
+    return values[0]
+
+
+def process_condition(
+    condition: Optional[str],
+    active_mod_ids: Union[ModIdSet, AbstractSet[str]] = frozenset(),
+) -> bool:
+    if not condition:
+        return False
 
-        return values[0]()
+    if not isinstance(active_mod_ids, ModIdSet):
+        active_mod_ids = ModIdSet(active_mod_ids)
 
-    tokens = re.findall(r"\(|\)|\w+\(.*?\)|&|\|", condition.replace(" ", ""))
-    return process_expression(tokens)
+    return compile_condition(condition)(active_mod_ids)
 
 
 @register_condition_handler("ifhas(")
-def handle_ifhas(inner_context: str, **kwargs) -> bool:
+def handle_ifhas(inner_context: str) -> Condition:
     """True if has mod"""
-    mod_id = inner_context.strip("'\"")
-    active_mod_ids = kwargs.get("active_mod_ids", set())
-    return mod_id in active_mod_ids
+    bit = ModIdSet.bit(inner_context.strip("'\""))
+    return lambda active_mod_ids: active_mod_ids.has_bit(bit)
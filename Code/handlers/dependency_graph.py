@@ -0,0 +1,551 @@
+import heapq
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from Code.package import (
+    ID_ADD,
+    ID_OVERRIDE,
+    Dependencie,
+    IdIndex,
+    IdLoader,
+    ModIdSet,
+    ModUnit,
+)
+
+from .condition_manager import compile_condition
+
+EDGE_PATCH = "patch"
+EDGE_REQUIREMENT = "requirement"
+EDGE_OVERRIDE = "override"
+
+# (before_id, after_id, kind): before_id has to load before after_id
+Edge = Tuple[str, str, str]
+
+# Kind reported when several constraints join the same pair of mods
+_KIND_PRIORITY = (EDGE_PATCH, EDGE_REQUIREMENT, EDGE_OVERRIDE)
+
+
+@dataclass
+class SortCycle:
+    # Every mod caught in the strongly connected component, by name
+    mod_ids: List[str]
+    # One concrete loop through it, in order, ending where it started
+    edges: List[Edge]
+
+
+@dataclass
+class SortResult:
+    order: List[ModUnit] = field(default_factory=list)
+    cycles: List[SortCycle] = field(default_factory=list)
+    # Mods that only wait on a cycle, they are not part of one themselves
+    blocked_ids: List[str] = field(default_factory=list)
+    # (mod_id, conflicting_id)
+    conflicts: List[Tuple[str, str]] = field(default_factory=list)
+    # (mod_id, missing_dependency_id)
+    missing: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return not self.cycles and not self.blocked_ids
+
+
+def check_dependencies(
+    mod: ModUnit, active_ids: ModIdSet
+) -> Tuple[List[Edge], List[Dependencie], List[Dependencie]]:
+    """(edges, missing, conflicts) of the mod's dependencies among active_ids.
+
+    Needs only the metadata, not the mod's ids."""
+    edges: List[Edge] = []
+    missing: List[Dependencie] = []
+    conflicts: List[Dependencie] = []
+    for dep in mod.metadata.dependencies:
+        if dep.condition and not compile_condition(dep.condition)(active_ids):
+            continue
+
+        if dep.type == "conflict":
+            if dep.id in active_ids:
+                conflicts.append(dep)
+
+        elif dep.id not in active_ids:
+            missing.append(dep)
+
+        elif dep.type == "patch":
+            edges.append((mod.id, dep.id, EDGE_PATCH))
+
+        elif dep.type == "requirement":
+            edges.append((dep.id, mod.id, EDGE_REQUIREMENT))
+
+    return edges, missing, conflicts
+
+
+def topological_order(
+    names: Dict[str, str], edges: Dict[str, Dict[str, str]]
+) -> Tuple[List[str], List[str]]:
+    """Kahn's algorithm with a (name, id) heap, so ties always break the same way.
+
+    Returns the ordered ids and the ids that could not be placed.
+    """
+    in_degree = dict.fromkeys(names, 0)
+    for targets in edges.values():
+        for target in targets:
+            in_degree[target] += 1
+
+    heap = [(names[node], node) for node, degree in in_degree.items() if degree == 0]
+    heapq.heapify(heap)
+
+    order = []
+    while heap:
+        _, node = heapq.heappop(heap)
+        order.append(node)
+        for target in edges.get(node, ()):
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                heapq.heappush(heap, (names[target], target))
+
+    placed = set(order)
+    return order, [node for node in names if node not in placed]
+
+
+def find_cycles(
+    names: Dict[str, str], edges: Dict[str, Dict[str, str]], nodes: List[str]
+) -> List[SortCycle]:
+    """Tarjan's SCC over `nodes`, one SortCycle per component that loops."""
+    node_set = set(nodes)
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    on_stack = set()
+    stack: List[str] = []
+    components: List[List[str]] = []
+
+    def successors(node: str) -> List[str]:
+        return [target for target in edges.get(node, ()) if target in node_set]
+
+    for root in sorted(nodes, key=lambda node: (names[node], node)):
+        if root in index:
+            continue
+
+        # Iterative DFS, a few thousand mods would overflow the recursion limit.
+        work = [(root, iter(successors(root)))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors(child))))
+
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+
+                components.append(component)
+
+    cycles = []
+    for component in components:
+        if len(component) == 1 and component[0] not in edges.get(component[0], ()):
+            continue
+
+        component.sort(key=lambda node: (names[node], node))
+        cycles.append(SortCycle(component, _shortest_loop(names, edges, component)))
+
+    cycles.sort(key=lambda cycle: (names[cycle.mod_ids[0]], cycle.mod_ids[0]))
+    return cycles
+
+
+def _shortest_loop(
+    names: Dict[str, str], edges: Dict[str, Dict[str, str]], component: List[str]
+) -> List[Edge]:
+    members = set(component)
+    start = component[0]
+    parents: Dict[str, Optional[str]] = {start: None}
+    queue = deque([start])
+
+    while queue:
+        node = queue.popleft()
+        targets = sorted(
+            (target for target in edges.get(node, ()) if target in members),
+            key=lambda target: (names[target], target),
+        )
+        for target in targets:
+            if target == start:
+                loop = [(node, start, edges[node][start])]
+                while parents[node] is not None:
+                    parent = parents[node]
+                    loop.append((parent, node, edges[parent][node]))  # type: ignore
+                    node = parent  # type: ignore
+
+                loop.reverse()
+                return loop
+
+            if target not in parents:
+                parents[target] = node
+                queue.append(target)
+
+    return []
+
+
+class DependencyGraph:
+    """Load-order constraints between the active mods, kept up to date per edit.
+
+    Every mod contributes its dependency edges and every overridden id
+    contributes its override edges; changing one contribution only marks the
+    mods at both ends dirty. sort() then re-runs only on the weakly connected
+    components that hold a dirty mod and merges them with the cached orders
+    of the rest. A (name, id) heap over a disjoint union picks exactly what a
+    merge of the per-component heap orders would, so the result matches a
+    full rebuild.
+    """
+
+    def __init__(self, position: Callable[[str], int]):
+        # Load position of an active mod, decides which adder owns an id.
+        self._position = position
+        self.clear()
+
+    def clear(self) -> None:
+        self._mods: Dict[str, ModUnit] = {}
+        self.ids = ModIdSet()
+
+        self._referrers: Dict[str, Set[str]] = defaultdict(set)
+        self._conditional: Set[str] = set()
+        # ids added by more than one active mod
+        self.shared_add_ids: Set[int] = set()
+        # Mods added before their ids were loaded, see attach_ids()
+        self.ids_pending: Set[str] = set()
+
+        # ("dep", mod_id) / ("override", IdTable number) -> edges it adds
+        self._contributions: Dict[Tuple[str, Union[str, int]], List[Edge]] = {}
+        # before -> after -> edge kind -> count
+        self._edges: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(dict)
+        # undirected neighbour -> count, for weak connectivity
+        self._links: Dict[str, Dict[str, int]] = defaultdict(dict)
+
+        self.missing: Dict[str, List[Dependencie]] = {}
+        self.conflicts: Dict[str, List[Dependencie]] = {}
+
+        self._dirty: Set[str] = set()
+        self._component_of: Dict[str, int] = {}
+        self._components: Dict[int, "_Component"] = {}
+        self._next_component = 0
+
+    def rebuild(self, mods: Iterable[ModUnit]) -> None:
+        mods = list(mods)
+        self.clear()
+        # Load the ids of every mod in parallel up front.
+        IdIndex.require(mods)
+        for mod in mods:
+            self.add_mod(mod)
+
+    def __contains__(self, mod_id: str) -> bool:
+        return mod_id in self._mods
+
+    def add_mod(self, mod: ModUnit) -> None:
+        """Add the mod's node and dependencies. If its ids are not loaded
+        yet they wait for attach_ids(), nothing blocks on them here."""
+        if mod.id in self._mods:
+            self.remove_mod(mod.id)
+
+        self._mods[mod.id] = mod
+        self.ids.add(mod.id)
+        self._dirty.add(mod.id)
+
+        for dep in mod.metadata.dependencies:
+            self._referrers[dep.id].add(mod.id)
+            if dep.condition:
+                self._conditional.add(mod.id)
+
+        self._refresh_dependencies({mod.id} | self._referrers.get(mod.id, set()))
+        if IdLoader.is_loaded(mod):
+            self.attach_ids(mod)
+
+        else:
+            self.ids_pending.add(mod.id)
+
+    def attach_ids(self, mod: ModUnit) -> None:
+        """Index the ids of a mod already in the graph, loading them first
+        if they aren't yet."""
+        if self._mods.get(mod.id) is not mod:
+            return
+
+        IdIndex.require([mod])
+        self.ids_pending.discard(mod.id)
+        self._refresh_overrides(self._index_ids(mod))
+
+    def remove_mod(self, mod_id: str) -> None:
+        mod = self._mods.pop(mod_id, None)
+        if mod is None:
+            return
+
+        self.ids.discard(mod_id)
+        self._dirty.add(mod_id)
+
+        for dep in mod.metadata.dependencies:
+            referrers = self._referrers.get(dep.id)
+            if referrers is not None:
+                referrers.discard(mod_id)
+                if not referrers:
+                    del self._referrers[dep.id]
+
+        self._conditional.discard(mod_id)
+        self.missing.pop(mod_id, None)
+        self.conflicts.pop(mod_id, None)
+        self._set_contribution(("dep", mod_id), [])
+
+        self._refresh_dependencies(self._referrers.get(mod_id, set()))
+        if mod_id in self.ids_pending:
+            self.ids_pending.discard(mod_id)
+
+        else:
+            self._refresh_overrides(self._index_ids(mod))
+
+    def update_mod(self, mod: ModUnit) -> None:
+        self.remove_mod(mod.id)
+        self.add_mod(mod)
+
+    def order_changed(self, mod_ids: Optional[Iterable[str]] = None) -> None:
+        # Only ids added by several mods can change owner when the order moves.
+        if mod_ids is None:
+            candidates = self.shared_add_ids
+
+        else:
+            candidates = {
+                add_id
+                for mod_id in mod_ids
+                if mod_id in self._mods and mod_id not in self.ids_pending
+                for add_id in self._mods[mod_id].add_id.numbers
+            }
+
+        self._refresh_overrides(
+            [
+                add_id
+                for add_id in candidates
+                if add_id in self.shared_add_ids and self._overriders(add_id)
+            ]
+        )
+
+    def _adders(self, identifier: int) -> List[str]:
+        return [
+            mod.id
+            for mod in IdIndex.find_loaded(identifier, ID_ADD)
+            if mod.id in self._mods and mod.id not in self.ids_pending
+        ]
+
+    def _overriders(self, identifier: int) -> List[str]:
+        return [
+            mod.id
+            for mod in IdIndex.find_loaded(identifier, ID_OVERRIDE)
+            if mod.id in self._mods
+            and mod.id not in self.ids_pending
+            and not self._mods[mod.id].get_bool_settigs("IgnoreOverrideCheck")
+        ]
+
+    def _index_ids(self, mod: ModUnit) -> List[int]:
+        # Called once the mod joined or left _mods, returns the overridden
+        # identifiers whose edges may have changed.
+        for add_id in mod.add_id.numbers:
+            if len(self._adders(add_id)) > 1:
+                self.shared_add_ids.add(add_id)
+
+            else:
+                self.shared_add_ids.discard(add_id)
+
+        return [
+            identifier
+            for identifier in (mod.add_id | mod.override_id).numbers
+            if ("override", identifier) in self._contributions
+            or self._adders(identifier)
+            and self._overriders(identifier)
+        ]
+
+    def _refresh_dependencies(self, mod_ids: Iterable[str]) -> None:
+        # Conditions may mention any mod, so conditional ones are always redone.
+        for mod_id in set(mod_ids) | self._conditional:
+            mod = self._mods.get(mod_id)
+            if mod is None:
+                continue
+
+            edges, missing, conflicts = check_dependencies(mod, self.ids)
+            self._set_list(self.missing, mod_id, missing)
+            self._set_list(self.conflicts, mod_id, conflicts)
+            self._set_contribution(("dep", mod_id), edges)
+
+    @staticmethod
+    def _set_list(target: Dict[str, List[Dependencie]], key: str, value: list):
+        if value:
+            target[key] = value
+
+        else:
+            target.pop(key, None)
+
+    def _refresh_overrides(self, identifiers: Iterable[int]) -> None:
+        for identifier in set(identifiers):
+            adders = self._adders(identifier)
+            overriders = self._overriders(identifier)
+            edges: List[Edge] = []
+            if adders and overriders:
+                owner = min(adders, key=self._position)
+                edges = [
+                    (owner, mod_id, EDGE_OVERRIDE)
+                    for mod_id in sorted(overriders)
+                    if mod_id != owner
+                ]
+
+            self._set_contribution(("override", identifier), edges)
+
+    def _set_contribution(
+        self, key: Tuple[str, Union[str, int]], edges: List[Edge]
+    ) -> None:
+        old = self._contributions.get(key, [])
+        if old == edges:
+            return
+
+        for before, after, kind in old:
+            self._unlink(before, after, kind)
+
+        for before, after, kind in edges:
+            self._link(before, after, kind)
+
+        if edges:
+            self._contributions[key] = edges
+
+        else:
+            self._contributions.pop(key, None)
+
+    def _link(self, before: str, after: str, kind: str) -> None:
+        kinds = self._edges[before].setdefault(after, {})
+        kinds[kind] = kinds.get(kind, 0) + 1
+        for a, b in ((before, after), (after, before)):
+            self._links[a][b] = self._links[a].get(b, 0) + 1
+
+        self._dirty.update((before, after))
+
+    def _unlink(self, before: str, after: str, kind: str) -> None:
+        kinds = self._edges[before][after]
+        kinds[kind] -= 1
+        if not kinds[kind]:
+            del kinds[kind]
+            if not kinds:
+                del self._edges[before][after]
+                if not self._edges[before]:
+                    del self._edges[before]
+
+        for a, b in ((before, after), (after, before)):
+            self._links[a][b] -= 1
+            if not self._links[a][b]:
+                del self._links[a][b]
+                if not self._links[a]:
+                    del self._links[a]
+
+        self._dirty.update((before, after))
+
+    def _component(self, start: str) -> List[str]:
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for neighbour in self._links.get(node, ()):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+
+        return list(seen)
+
+    def _resort_dirty(self) -> None:
+        affected: Set[str] = set(self._dirty)
+        for mod_id in self._dirty:
+            component = self._component_of.get(mod_id)
+            if component in self._components:
+                affected.update(self._components.pop(component).members)
+
+        self._dirty.clear()
+        for mod_id in affected:
+            self._component_of.pop(mod_id, None)
+
+        for mod_id in affected:
+            if mod_id not in self._mods or mod_id in self._component_of:
+                continue
+
+            members = self._component(mod_id)
+            names = {member: self._mods[member].name for member in members}
+            edges = {
+                member: {
+                    after: next(kind for kind in _KIND_PRIORITY if kind in kinds)
+                    for after, kinds in targets.items()
+                }
+                for member in members
+                if (targets := self._edges.get(member))
+            }
+
+            component = _Component(members, *topological_order(names, edges))
+            if component.unresolved:
+                component.cycles = find_cycles(names, edges, component.unresolved)
+
+            self._components[self._next_component] = component
+            for member in members:
+                self._component_of[member] = self._next_component
+
+            self._next_component += 1
+
+    def sort(self) -> SortResult:
+        self._resort_dirty()
+        result = SortResult()
+
+        for component in self._components.values():
+            in_cycle = {
+                mod_id for cycle in component.cycles for mod_id in cycle.mod_ids
+            }
+            result.cycles.extend(component.cycles)
+            result.blocked_ids.extend(
+                mod_id for mod_id in component.unresolved if mod_id not in in_cycle
+            )
+
+        result.cycles.sort(
+            key=lambda cycle: (self._mods[cycle.mod_ids[0]].name, cycle.mod_ids[0])
+        )
+
+        for mod_id, conflicts in self.conflicts.items():
+            result.conflicts.extend((mod_id, dep.id) for dep in conflicts)
+
+        for mod_id, missing in self.missing.items():
+            result.missing.extend((mod_id, dep.id) for dep in missing)
+
+        if not result.success:
+            return result
+
+        result.order = [
+            self._mods[mod_id]
+            for mod_id in heapq.merge(
+                *(component.order for component in self._components.values()),
+                key=lambda mod_id: (self._mods[mod_id].name, mod_id),
+            )
+        ]
+        return result
+
+
+@dataclass
+class _Component:
+    members: List[str]
+    order: List[str]
+    unresolved: List[str]
+    cycles: List[SortCycle] = field(default_factory=list)
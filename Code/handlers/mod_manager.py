@@ -1,28 +1,54 @@
 import atexit
 import logging
-from collections import defaultdict, deque
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional
+from queue import Empty, Queue
+from typing import Callable, Iterator, List, Optional, Set, Tuple
 
 from Code.app_vars import AppConfig
 from Code.loc import Localization as loc
-from Code.package.dataclasses import ModUnit
+from Code.package import (
+    ID_ADD,
+    ID_OVERRIDE,
+    IdIndex,
+    IdLoader,
+    IdTable,
+    ModOrder,
+    ModUnit,
+    ScanCache,
+)
 from Code.xml_object import XMLBuilder, XMLComment, XMLElement
 
-from .condition_manager import process_condition
+from .dependency_graph import DependencyGraph, SortResult, check_dependencies
 from .parts_manager import PartsManager
 
 logger = logging.getLogger(__name__)
 
 
 class ModManager:
-    active_mods: List[ModUnit] = []
-    inactive_mods: List[ModUnit] = []
+    active_mods: ModOrder = ModOrder()
+    inactive_mods: ModOrder = ModOrder()
+    graph: DependencyGraph = DependencyGraph(active_mods.index)
+    # The graph needs the ids of every active mod, so it is only built once
+    # sort() or process_errors() ask for it.
+    _graph_ready: bool = False
+    # Mods activated into a ready graph whose ids finished loading, filled by
+    # the futures' done-callbacks and attached on the GUI thread.
+    _ids_ready: Queue = Queue()
+
+    # Background loading, see start_loading()
+    _load_queue: Optional[Queue] = None
+    _loading: bool = False
+    _load_done: int = 0
+    _load_total: int = 0
+    # Bumped by every load, a worker of an older one stops at its next check.
+    _load_generation: int = 0
 
     @staticmethod
     def init():
-        ModManager.load_mods()
+        PartsManager.recover()
+        ModManager.start_loading()
         ModManager.load_cslua_config()
         atexit.register(ModManager._on_exit)
 
@@ -32,18 +58,154 @@ class ModManager:
         if not game_path:
             return
 
+        ModManager._reset_loading()
+        generation = ModManager._load_generation
+        for status, mod in ModManager._iter_mod_builds(game_path, generation):
+            ModManager._add_loaded(status, mod)
+
+        ModManager._finish_loading()
+
+    @staticmethod
+    def start_loading(rescan: bool = False) -> None:
+        """load_mods() on a background thread, the GUI picks the mods up with
+        drain_loaded() as they are built."""
+        game_path = AppConfig.get_game_path()
+        if not game_path:
+            return
+
+        if rescan:
+            ScanCache.clear()
+
+        ModManager._reset_loading()
+        # A newer start replaces the queue and the generation, an older
+        # worker stops and whatever it still produces goes nowhere.
+        generation = ModManager._load_generation
+        load_queue: Queue = Queue()
+        ModManager._load_queue = load_queue
+        ModManager._loading = True
+
+        def worker():
+            try:
+                for item in ModManager._iter_mod_builds(game_path, generation):
+                    load_queue.put(item)
+
+            except Exception as err:
+                logger.error(f"Mod loading failed\n|Error: {err}")
+
+            finally:
+                load_queue.put(None)
+
+        threading.Thread(target=worker, name="ModLoader", daemon=True).start()
+
+    @staticmethod
+    def is_loading() -> bool:
+        return ModManager._loading
+
+    @staticmethod
+    def get_load_progress() -> Tuple[int, int]:
+        return ModManager._load_done, ModManager._load_total
+
+    @staticmethod
+    def drain_loaded(limit: int = 256) -> bool:
+        """Move up to `limit` built mods into the lists, on the GUI thread.
+
+        Returns True if anything changed."""
+        load_queue = ModManager._load_queue
+        if load_queue is None:
+            return False
+
+        changed = False
+        for _ in range(limit):
+            try:
+                item = load_queue.get_nowait()
+
+            except Empty:
+                break
+
+            changed = True
+            if item is None:
+                ModManager._finish_loading()
+                break
+
+            ModManager._add_loaded(*item)
+
+        return changed
+
+    @staticmethod
+    def _reset_loading() -> None:
         ModManager.active_mods.clear()
         ModManager.inactive_mods.clear()
-        ModManager.load_active_mods(game_path / "config_player.xml")
+        IdIndex.clear()
+        ModManager._graph_ready = False
+        ModManager._load_queue = None
+        ModManager._load_done = 0
+        ModManager._load_total = 0
+        ModManager._load_generation += 1
+
+    @staticmethod
+    def _add_loaded(status: str, mod: ModUnit) -> None:
+        if status == "active":
+            # Builds finish in any order, the earliest entry of a mod listed
+            # twice in config_player.xml wins like before.
+            existing = ModManager.active_mods.get(mod.id)
+            if existing is not None:
+                if existing.load_order <= mod.load_order:  # type: ignore
+                    return
+
+                ModManager.active_mods.remove(existing)
+
+            # Kept in arrival order, _finish_loading() puts it in load order.
+            ModManager.active_mods.append(mod)
+
+        elif mod.id not in ModManager.active_mods:
+            ModManager.inactive_mods.append(mod)
+
+    @staticmethod
+    def _finish_loading() -> None:
+        ModManager.active_mods.sort(key=lambda m: m.load_order)  # type: ignore
+        for index, mod in enumerate(ModManager.active_mods, start=1):
+            mod.load_order = index
+
+        IdIndex.rebuild([*ModManager.active_mods, *ModManager.inactive_mods])
+        ModManager._graph_ready = False
+        ModManager._load_queue = None
+        ModManager._loading = False
+
+    @staticmethod
+    def _iter_mod_builds(
+        game_path: Path, generation: int
+    ) -> Iterator[Tuple[str, ModUnit]]:
+        # Runs off the GUI thread, so it keeps its own bookkeeping instead of
+        # reading active_mods/inactive_mods.
+        known_ids: Set[str] = set()
+        known_paths: Set[Path] = set()
+        for mod in ModManager._build_active_mods(
+            game_path / "config_player.xml", generation
+        ):
+            known_ids.add(mod.id)
+            known_paths.add(mod.path.resolve())
+            yield "active", mod
+
+        mod_dirs = [game_path / "LocalMods"]
         inactive_mods_dir = AppConfig.get("steam_mod_dir", None)
         if inactive_mods_dir:
-            inactive_mods_dir = Path(inactive_mods_dir)
-            ModManager.load_inactive_mods(inactive_mods_dir)
+            mod_dirs.insert(0, Path(inactive_mods_dir))
+
+        for mod_dir in mod_dirs:
+            if generation != ModManager._load_generation:
+                return
 
-        ModManager.load_inactive_mods((game_path / "LocalMods"))
+            for mod in ModManager._build_inactive_mods(
+                mod_dir, known_ids, known_paths, generation
+            ):
+                if mod.id not in known_ids:
+                    known_ids.add(mod.id)
+                    yield "inactive", mod
 
     @staticmethod
-    def load_active_mods(path_to_config_player: Path):
+    def _build_active_mods(
+        path_to_config_player: Path, generation: int
+    ) -> Iterator[ModUnit]:
         if not path_to_config_player.exists():
             logger.error(
                 f"config_player.xml path doesn't exist!\n|Path: {path_to_config_player}"
@@ -62,6 +224,8 @@ class ModManager:
             for i, package in enumerate(packages, start=1)
             if package.tag == "package" and package.attributes.get("path", None)
         ]
+        if generation == ModManager._load_generation:
+            ModManager._load_total += len(package_paths)
 
         def process_package(index, path):
             try:
@@ -84,32 +248,38 @@ class ModManager:
                 logger.error(err)
                 return None
 
-        with ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(process_package, index, path)
-                for index, path in package_paths
-            ]
-
-            for future in as_completed(futures):
-                mod = future.result()
-                if mod is not None:
-                    ModManager.active_mods.append(mod)
-
-        ModManager.active_mods.sort(key=lambda m: m.load_order)  # type: ignore
-        for index, mod in enumerate(ModManager.active_mods, start=1):
-            mod.load_order = index
+        yield from ModManager._run_builds(
+            process_package,
+            [(index, path) for index, path in package_paths],
+            generation,
+        )
 
     @staticmethod
-    def load_inactive_mods(path_to_all_mods: Path):
+    def _build_inactive_mods(
+        path_to_all_mods: Path,
+        known_ids: Set[str],
+        known_paths: Set[Path],
+        generation: int,
+    ) -> Iterator[ModUnit]:
         if not path_to_all_mods.exists():
             logger.error(f"Dir not exists!\n|Path: {path_to_all_mods}")
             return
 
-        package_paths = [
-            path
-            for path in Path(path_to_all_mods).iterdir()
-            if path.is_dir() and not path.name.startswith(".")
-        ]
+        # The same folder can show up twice (symlinks, LocalMods configured as
+        # the workshop dir) and active mods live here too, skip them by
+        # canonical path before anything is parsed.
+        package_paths = []
+        for path in Path(path_to_all_mods).iterdir():
+            if not path.is_dir() or path.name.startswith("."):
+                continue
+
+            canonical_path = path.resolve()
+            if canonical_path not in known_paths:
+                known_paths.add(canonical_path)
+                package_paths.append((path,))
+
+        if generation == ModManager._load_generation:
+            ModManager._load_total += len(package_paths)
 
         def process_package(path: Path):
             try:
@@ -120,6 +290,11 @@ class ModManager:
 
                     path = Path(new_path / path)
 
+                # Only the filelist.xml root tag, a copy of a loaded mod found
+                # under another path is not worth a full build.
+                if ModUnit.peek_id(path) in known_ids:
+                    return None
+
                 mod = ModUnit.build(path)
                 if mod is None:
                     return None
@@ -130,18 +305,30 @@ class ModManager:
                 logger.error(err)
                 return None
 
-        all_mods_ids = {
-            mod.id for mod in ModManager.active_mods + ModManager.inactive_mods
-        }
+        yield from ModManager._run_builds(process_package, package_paths, generation)
+
+    @staticmethod
+    def _run_builds(
+        process_package: Callable[..., Optional[ModUnit]],
+        args: List[tuple],
+        generation: int,
+    ) -> Iterator[ModUnit]:
         with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(process_package, path) for path in package_paths]
-            for future in as_completed(futures):
-                mod = future.result()
-                if mod is not None:
-                    if mod.id in all_mods_ids:
-                        continue
+            futures = [executor.submit(process_package, *arg) for arg in args]
+            try:
+                for future in as_completed(futures):
+                    if generation != ModManager._load_generation:
+                        return
 
-                    ModManager.inactive_mods.append(mod)
+                    ModManager._load_done += 1
+                    mod = future.result()
+                    if mod is not None:
+                        yield mod
+
+            finally:
+                # Nothing is left after a full run. After a stale or abandoned
+                # one the builds not started yet are dropped, not awaited.
+                executor.shutdown(wait=False, cancel_futures=True)
 
     @staticmethod
     def load_cslua_config():
@@ -164,7 +351,7 @@ class ModManager:
         # CS
         config_path = game_path / "LuaCsSetupConfig.xml"
         if config_path.exists():
-            xml_obj = XMLBuilder.load(config_path)
+            xml_obj = XMLBuilder.load_root(config_path)
             has_cs = (
                 xml_obj.attributes.get("EnableCsScripting", "false").lower() == "true"
                 if xml_obj
@@ -179,94 +366,69 @@ class ModManager:
 
     @staticmethod
     def find_mod_by_id(mod_id: str) -> Optional[ModUnit]:
-        for mod in ModManager.active_mods + ModManager.inactive_mods:
-            if mod.id == mod_id:
-                return mod
-
-        return None
+        return ModManager.get_mod_by_id(mod_id)
 
     @staticmethod
     def get_mod_by_id(mod_id: str) -> Optional[ModUnit]:
-        for mod in ModManager.active_mods + ModManager.inactive_mods:
-            if mod.id == mod_id:
-                return mod
+        mod = ModManager.active_mods.get(mod_id)
+        if mod is None:
+            mod = ModManager.inactive_mods.get(mod_id)
 
-        return None
+        return mod
 
     @staticmethod
     def activate_mod(mod_id: str) -> bool:
-        mod = ModManager.get_mod_by_id(mod_id)
-        if mod and mod in ModManager.inactive_mods:
-            ModManager.inactive_mods.remove(mod)
-            ModManager.active_mods.append(mod)
-            return True
-
-        return False
+        mod = ModManager.inactive_mods.get(mod_id)
+        if mod is None or mod_id in ModManager.active_mods:
+            return False
+
+        ModManager.inactive_mods.remove(mod)
+        ModManager.active_mods.append(mod)
+        if ModManager._graph_ready:
+            ModManager.graph.add_mod(mod)
+            if mod.id in ModManager.graph.ids_pending:
+                IdLoader.request(mod).add_done_callback(
+                    lambda _: ModManager._ids_ready.put(mod)
+                )
+        return True
 
     @staticmethod
     def deactivate_mod(mod_id: str) -> bool:
-        mod = ModManager.get_mod_by_id(mod_id)
-        if mod and mod in ModManager.active_mods:
-            ModManager.active_mods.remove(mod)
-            ModManager.inactive_mods.append(mod)
-            return True
+        mod = ModManager.active_mods.get(mod_id)
+        if mod is None or mod_id in ModManager.inactive_mods:
+            return False
 
-        return False
+        ModManager.active_mods.remove(mod)
+        ModManager.inactive_mods.append(mod)
+        if ModManager._graph_ready:
+            ModManager.graph.remove_mod(mod_id)
+        return True
 
     @staticmethod
     def swap_active_mods(mod_id1: str, mod_id2: str) -> None:
-        mod1 = ModManager.get_mod_by_id(mod_id1)
-        mod2 = ModManager.get_mod_by_id(mod_id2)
-        if (
-            mod1
-            and mod2
-            and mod1 in ModManager.active_mods
-            and mod2 in ModManager.active_mods
-        ):
-            idx1, idx2 = (
-                ModManager.active_mods.index(mod1),
-                ModManager.active_mods.index(mod2),
-            )
-            ModManager.active_mods[idx1], ModManager.active_mods[idx2] = (
-                ModManager.active_mods[idx2],
-                ModManager.active_mods[idx1],
-            )
+        if ModManager.active_mods.swap(mod_id1, mod_id2) and ModManager._graph_ready:
+            ModManager.graph.order_changed((mod_id1, mod_id2))
 
     @staticmethod
     def swap_inactive_mods(mod_id1: str, mod_id2: str) -> None:
-        mod1 = ModManager.get_mod_by_id(mod_id1)
-        mod2 = ModManager.get_mod_by_id(mod_id2)
-        if (
-            mod1
-            and mod2
-            and mod1 in ModManager.inactive_mods
-            and mod2 in ModManager.inactive_mods
-        ):
-            idx1, idx2 = (
-                ModManager.inactive_mods.index(mod1),
-                ModManager.inactive_mods.index(mod2),
-            )
-            ModManager.inactive_mods[idx1], ModManager.inactive_mods[idx2] = (
-                ModManager.inactive_mods[idx2],
-                ModManager.inactive_mods[idx1],
-            )
+        ModManager.inactive_mods.swap(mod_id1, mod_id2)
 
     @staticmethod
     def move_active_mod_to_end(mod_id: str) -> None:
-        mod = ModManager.get_mod_by_id(mod_id)
-        if mod and mod in ModManager.active_mods:
-            ModManager.active_mods.remove(mod)
-            ModManager.active_mods.append(mod)
+        if ModManager.active_mods.move_to_end(mod_id) and ModManager._graph_ready:
+            ModManager.graph.order_changed((mod_id,))
 
     @staticmethod
     def move_inactive_mod_to_end(mod_id: str) -> None:
-        mod = ModManager.get_mod_by_id(mod_id)
-        if mod and mod in ModManager.inactive_mods:
-            ModManager.inactive_mods.remove(mod)
-            ModManager.inactive_mods.append(mod)
+        ModManager.inactive_mods.move_to_end(mod_id)
 
     @staticmethod
     def save_mods() -> None:
+        # A half-loaded list would drop the missing mods from the config.
+        if ModManager.is_loading():
+            logger.warning("Mods are still loading, config_player.xml not saved")
+            return
+
         game_path = AppConfig.get("barotrauma_dir", None)
         if not game_path:
             logger.error("Game path not set!")
@@ -303,25 +465,31 @@ class ModManager:
 
         regularpackages.childrens.clear()
 
-        active_mod_id = set([mod.id for mod in ModManager.active_mods])
+        IdLoader.ensure(ModManager.active_mods)
+        PartsManager.apply_changes(
+            [mod for mod in ModManager.active_mods if mod.has_toggle_content],
+            ModManager.active_mods.ids,
+        )
         for mod in ModManager.active_mods:
-            if mod.has_toggle_content:
-                PartsManager.do_chenges(mod, active_mod_id)
-
             mod_path = mod.get_str_path()
             regularpackages.add_child(XMLComment(mod.name))
             regularpackages.add_child(
                 XMLElement("package", {"path": f"{mod_path}/filelist.xml"})
             )
 
-        del active_mod_id
-
         XMLBuilder.save(xml_obj, user_config_path)
 
     @staticmethod
     def _on_exit():
         try:
-            if not (ModManager.active_mods + ModManager.inactive_mods):
+            # Only the files the journal lists are reopened.
+            PartsManager.rollback_journal()
+            PartsManager.shutdown()
+
+            if not (ModManager.active_mods or ModManager.inactive_mods):
+                return
+
+            if ModManager.is_loading():
                 return
 
             game_path = AppConfig.get("barotrauma_dir", None)
@@ -368,13 +536,6 @@ class ModManager:
                         XMLElement("package", {"path": f"{mod_path}/filelist.xml"})
                     )
 
-                    if mod.has_toggle_content:
-                        try:
-                            PartsManager.rollback_changes_no_thread(mod)
-                        except Exception as e:
-                            logger.error(
-                                f"Error rolling back changes for mod {mod.name}: {e}"
-                            )
                 except Exception as e:
                     logger.error(f"Error processing mod {mod.name}: {e}")
                     continue
@@ -385,168 +546,158 @@ class ModManager:
             logger.error(f"Error during exit processing: {e}")
 
     @staticmethod
-    def process_errors():
-        active_mods_ids = {mod.id for mod in ModManager.active_mods}
-        bind_id = {}
-        for mod in ModManager.active_mods:
-            mod.update_meta_errors()
-            for dep in mod.metadata.dependencies:
-                if dep.type == "conflict":
-                    if dep.id in active_mods_ids:
-                        level = dep.attributes.get("level", "error")
-                        if level == "warning":
-                            mod.metadata.warnings.append(
-                                dep.attributes.get("message", "base-conflict")
-                            )
-                        else:
-                            mod.metadata.errors.append(
-                                dep.attributes.get("message", "base-conflict")
-                            )
-
-                elif dep.condition:
-                    if process_condition(
-                        dep.condition, active_mods_ids=active_mods_ids
-                    ):
-                        if dep.id not in active_mods_ids:
-                            mod.metadata.errors.append(
-                                loc.get_string(
-                                    "mod-unfind-mod",
-                                    mod_name=dep.name,
-                                    mod_id=dep.steam_id,
-                                )
-                            )
-                else:
-                    if dep.id not in active_mods_ids:
-                        mod.metadata.errors.append(
-                            loc.get_string(
-                                "mod-unfind-mod",
-                                mod_name=dep.name,
-                                mod_id=dep.steam_id,
-                            )
-                        )
+    def get_graph() -> DependencyGraph:
+        graph = ModManager.graph
+        if not ModManager._graph_ready:
+            graph.rebuild(ModManager.active_mods)
+            ModManager._graph_ready = True
+
+        # Mods activated since, the ids of any still loading are waited for.
+        for mod_id in list(graph.ids_pending):
+            mod = ModManager.active_mods.get(mod_id)
+            if mod is not None:
+                graph.attach_ids(mod)
+
+        return graph
+
+    @staticmethod
+    def _attach_ready_ids() -> None:
+        while True:
+            try:
+                mod = ModManager._ids_ready.get_nowait()
+
+            except Empty:
+                return
 
+            if ModManager._graph_ready:
+                ModManager.graph.attach_ids(mod)
+
+    @staticmethod
+    def count_ids_pending() -> int:
+        return sum(not IdLoader.is_loaded(mod) for mod in ModManager.active_mods)
+
+    @staticmethod
+    def process_errors() -> int:
+        """Refresh the errors of every active mod whose ids are loaded, the
+        rest are requested in the background and left as they are.
+
+        Returns how many active mods are still waiting for their ids."""
+        ModManager._attach_ready_ids()
+        pending: Set[str] = set()
         for mod in ModManager.active_mods:
-            for over_id in mod.override_id:
-                if over_id not in bind_id:
-                    bind_id[over_id] = (mod.name, mod.id)
+            if not IdLoader.is_loaded(mod):
+                IdLoader.request(mod)
+                pending.add(mod.id)
 
+        # The graph needs every active mod's ids, until then the dependencies
+        # of each loaded mod are checked on their own.
+        graph = None if pending else ModManager.get_graph()
         for mod in ModManager.active_mods:
-            for over_id in mod.override_id:
-                if over_id in bind_id:
+            if mod.id in pending:
+                continue
+
+            mod.update_meta_errors()
+            if graph is not None:
+                conflicts = graph.conflicts.get(mod.id, ())
+                missing = graph.missing.get(mod.id, ())
+
+            else:
+                _, missing, conflicts = check_dependencies(
+                    mod, ModManager.active_mods.ids
+                )
+
+            for dep in conflicts:
+                level = dep.attributes.get("level", "error")
+                if level == "warning":
                     mod.metadata.warnings.append(
-                        loc.get_string(
-                            "mod-override-id",
-                            mod_name=bind_id[over_id][0],
-                            mod_id=bind_id[over_id][1],
-                            key_id=over_id,
-                        )
+                        dep.attributes.get("message", "base-conflict")
+                    )
+                else:
+                    mod.metadata.errors.append(
+                        dep.attributes.get("message", "base-conflict")
                     )
 
-    @staticmethod
-    def sort():
-        mods = ModManager.active_mods
-        id_to_mod = {mod.id: mod for mod in mods}
-        id_to_name = {mod.id: mod.name for mod in mods}
-        active_mod_ids = set(id_to_mod.keys())
-        ban_ids = set()
-
-        dependency_graph = defaultdict(list)
-        in_degree = defaultdict(int)
-        added_ids = {}
-
-        for mod in mods:
-            for dep in mod.metadata.dependencies:
-                if dep.condition and not process_condition(
-                    dep.condition, active_mod_ids=active_mod_ids
-                ):
-                    continue
+            for dep in missing:
+                mod.metadata.errors.append(
+                    loc.get_string(
+                        "mod-unfind-mod",
+                        mod_name=dep.name,
+                        mod_id=dep.steam_id,
+                    )
+                )
 
-                dep_id = dep.id
+        if pending:
+            return len(pending)
+
+        # Only ids overridden by several mods can clash, the first one loaded
+        # is reported on every later one.
+        for over_id in IdIndex.shared(ID_OVERRIDE, ModManager.active_mods):
+            overriders = IdIndex.find(over_id, ID_OVERRIDE, ModManager.active_mods)
+            for mod in overriders[1:]:
+                mod.metadata.warnings.append(
+                    loc.get_string(
+                        "mod-override-id",
+                        mod_name=overriders[0].name,
+                        mod_id=overriders[0].id,
+                        key_id=over_id,
+                    )
+                )
 
-                if dep.type == "conflict":
-                    if dep_id in id_to_mod:
-                        ban_ids.add(dep_id)
-                        logger.error(
-                            f"Conflict detected between '{mod.name}' and '{id_to_name.get(dep_id, dep_id)}'."
-                        )
-                    continue
+        return 0
 
-                if dep_id not in id_to_mod:
-                    if not ModManager.activate_mod(dep_id):
-                        logger.warning(
-                            f"Dependency '{dep_id}' specified in mod '{mod.name}' not found among active mods."
-                        )
-                        continue
-                    else:
-                        if dep_id in ban_ids:
-                            logger.error(
-                                f"Conflict detected between '{mod.name}' and '{id_to_name.get(dep_id, dep_id)}'."
-                            )
-                            continue
-
-                        on_mod = ModManager.get_mod_by_id(dep_id)
-                        id_to_mod[on_mod.id] = on_mod  # type: ignore
-                        id_to_name[on_mod.id] = on_mod.name  # type: ignore
-                        active_mod_ids.add(on_mod.id)  # type: ignore
-
-                if dep.type == "patch":
-                    dependency_graph[mod.id].append(dep_id)
-                    in_degree[dep_id] += 1
-
-                elif dep.type == "requirement":
-                    dependency_graph[dep_id].append(mod.id)
-                    in_degree[mod.id] += 1
-
-                elif dep.type == "requiredAnyOrder":
-                    pass
-
-        for mod in mods:
-            for add_id in mod.add_id:
-                if add_id in added_ids:
-                    logger.warning(
-                        f"Conflict: add_id '{add_id}' already added by '{id_to_name[added_ids[add_id]]}' but '{mod.name}' try add one more time"
-                    )
-                else:
-                    added_ids[add_id] = mod.id
-
-        for mod in mods:
-            if not mod.get_bool_settigs("IgnoreOverrideCheck"):
-                for override_id in mod.override_id:
-                    if override_id in added_ids:
-                        adder_mod_id = added_ids[override_id]
-                        if adder_mod_id != mod.id:
-                            dependency_graph[adder_mod_id].append(mod.id)
-                            in_degree[mod.id] += 1
-
-        queue = deque(
-            sorted(
-                [mod_id for mod_id in id_to_mod if in_degree[mod_id] == 0],
-                key=lambda id: id_to_name[id],
+    @staticmethod
+    def sort() -> SortResult:
+        graph = ModManager.get_graph()
+
+        # Installed but inactive dependencies get switched on, they can have
+        # missing dependencies of their own.
+        activated = True
+        while activated:
+            activated = False
+            for missing in list(graph.missing.values()):
+                for dep in missing:
+                    if ModManager.activate_mod(dep.id):
+                        activated = True
+
+        result = graph.sort()
+
+        for mod_id, dep_id in result.conflicts:
+            logger.error(
+                f"Conflict detected between '{ModManager._get_name(mod_id)}' and '{ModManager._get_name(dep_id)}'."
             )
-        )
 
-        sorted_mods: List[ModUnit] = []
-        while queue:
-            current_id = queue.popleft()
-            current_mod = id_to_mod[current_id]
-            sorted_mods.append(current_mod)
+        for mod_id, dep_id in result.missing:
+            logger.warning(
+                f"Dependency '{dep_id}' specified in mod '{ModManager._get_name(mod_id)}' not found among active mods."
+            )
 
-            for neighbor_id in sorted(
-                dependency_graph[current_id], key=lambda id_: id_to_name[id_]
-            ):
-                in_degree[neighbor_id] -= 1
-                if in_degree[neighbor_id] == 0:
-                    queue.append(neighbor_id)
+        for add_id in sorted(map(IdTable.name, graph.shared_add_ids)):
+            adders = IdIndex.find(add_id, ID_ADD, ModManager.active_mods)
+            for mod in adders[1:]:
+                logger.warning(
+                    f"Conflict: add_id '{add_id}' already added by '{adders[0].name}' but '{mod.name}' try add one more time"
+                )
 
-        if len(sorted_mods) != len(mods):
-            unresolved_mods = set(id_to_mod.keys()) - set(mod.id for mod in sorted_mods)
-            unresolved_names = [id_to_name[mod_id] for mod_id in unresolved_mods]
+        for cycle in result.cycles:
+            chain = " -> ".join(
+                f"'{ModManager._get_name(before)}' ({kind})"
+                for before, _, kind in cycle.edges
+            )
             logger.error(
-                f"Unresolved dependencies or cycles detected for mods: {', '.join(unresolved_names)}"
+                f"Dependency cycle detected: {chain} -> '{ModManager._get_name(cycle.edges[0][0])}'"
             )
-            return
 
-        for i, mod in enumerate(sorted_mods, 1):
+        if not result.success:
+            return result
+
+        for i, mod in enumerate(result.order, 1):
             mod.load_order = i
 
-        ModManager.active_mods = sorted_mods
+        ModManager.active_mods.replace(result.order)
+        graph.order_changed()
+        return result
+
+    @staticmethod
+    def _get_name(mod_id: str) -> str:
+        mod = ModManager.get_mod_by_id(mod_id)
+        return mod.name if mod else mod_id
@@ -1,146 +1,461 @@
 import logging
+import os
 import re
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Set
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from Code.app_vars import AppConfig
-from Code.package import ModUnit
+from Code.package import InventoryFile, ModIdSet, ModUnit, has_toggle_marker
 from Code.xml_object import XMLBuilder, XMLComment, XMLElement
 
 from .condition_manager import process_condition
+from .toggle_journal import ToggleJournal
+from .toggle_regions import (
+    Edit,
+    ToggleChange,
+    ToggleRegion,
+    find_regions,
+    splice,
+    write_atomic,
+)
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class ToggleResult:
+    mod_id: str
+    path: Path
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class TogglePlan:
+    is_fix: bool
+    active_mod_ids: ModIdSet
+    # Every BTM part that gets switched
+    changes: List[ToggleChange] = field(default_factory=list)
+    # Mods whose modparts.xml is applied to their filelist.xml, path -> id
+    config_mods: Dict[Path, str] = field(default_factory=dict)
+    # Files that couldn't be planned, they are left alone
+    errors: List[ToggleResult] = field(default_factory=list)
+
+    def by_file(self) -> Dict[Path, List[ToggleChange]]:
+        files: Dict[Path, List[ToggleChange]] = {}
+        for change in self.changes:
+            files.setdefault(change.path, []).append(change)
+
+        return files
+
+
+# (mod id, file reported in the result, work, arguments)
+_ToggleTask = Tuple[str, Path, Callable, tuple]
+
+
 # TODO: Это бы рефакторнуть разок
 class PartsManager:
+    # Files handled at the same time, across every mod of a batch
+    max_workers: int = min(8, os.cpu_count() or 1)
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _lock = threading.Lock()
+
     # BTM: conditions="", setState="on/off": start
     # BTM: end
-    @staticmethod
-    def do_chenges(mod: ModUnit, active_mod_ids: Set[str]):
-        PartsManager._corrupt_xml_by_config(mod.path, active_mod_ids)
-
-        for xml_path in mod.path.rglob("*.xml"):
-            if xml_path.name.lower() in AppConfig.xml_system_dirs:
-                continue
+    @classmethod
+    def plan_changes(
+        cls, mods: Iterable[ModUnit], active_mod_ids: ModIdSet
+    ) -> TogglePlan:
+        """What apply_changes() would switch, nothing is written."""
+        return cls._plan(mods, active_mod_ids, is_fix=False)
+
+    @classmethod
+    def plan_rollback(cls, mods: Iterable[ModUnit]) -> TogglePlan:
+        """What rollback_changes() would switch, nothing is written."""
+        return cls._plan(mods, ModIdSet(), is_fix=True)
+
+    @classmethod
+    def apply_changes(
+        cls, mods: Iterable[ModUnit], active_mod_ids: ModIdSet
+    ) -> List[ToggleResult]:
+        """Switch the BTM parts of all given mods for the active set, as one batch."""
+        return cls.apply_plan(cls.plan_changes(mods, active_mod_ids))
+
+    @classmethod
+    def rollback_changes(cls, mods: Iterable[ModUnit]) -> List[ToggleResult]:
+        """Put the BTM parts of all given mods back to their shipped state."""
+        return cls.apply_plan(cls.plan_rollback(mods))
+
+    @classmethod
+    def apply_plan(cls, plan: TogglePlan) -> List[ToggleResult]:
+        # Journal first: if the app dies halfway, the next start still knows
+        # which files may have been switched.
+        ToggleJournal.record(plan.changes, plan.config_mods, plan.is_fix)
+        results = []
+        if plan.is_fix:
+            results += cls._run(cls._rename_tasks(plan.config_mods, every_mod=False))
+
+        # filelist.xml entries switched off rename their files, so the BTM
+        # parts go first, while every planned file still has its name.
+        results += cls._run(cls._file_tasks(plan, cls._apply_file))
+        results += cls._run(cls._config_tasks(plan))
+        return plan.errors + [result for _, result in results]
+
+    @classmethod
+    def rollback_journal(cls) -> List[ToggleResult]:
+        """Undo everything the journal recorded, only touched files are opened."""
+        changes, config_mods = ToggleJournal.take()
+        plan = TogglePlan(True, ModIdSet(), changes, config_mods)
+        # The reverse of apply_plan(): files get their names back first.
+        rename_results = [
+            result
+            for _, result in cls._run(cls._rename_tasks(config_mods, every_mod=True))
+        ]
+        config_results = [result for _, result in cls._run(cls._config_tasks(plan))]
+        file_results = [
+            result for _, result in cls._run(cls._file_tasks(plan, cls._replay_file))
+        ]
+
+        results = rename_results + config_results + file_results
+        if all(result.ok for result in results):
+            ToggleJournal.clear()
+
+        else:
+            # Whatever couldn't be restored (a locked file...) stays journaled
+            # for the next exit or start. Restored renames are already gone.
+            ToggleJournal.retain(
+                {result.path for result in file_results if not result.ok},
+                {result.path.parent for result in config_results if not result.ok},
+            )
+
+        return results
+
+    @classmethod
+    def recover(cls) -> None:
+        """Roll back what a session that didn't exit cleanly left switched."""
+        if ToggleJournal.is_empty():
+            return
 
-            with ThreadPoolExecutor() as executor:
-                executor.submit(
-                    PartsManager._corrupt_xml_by_commits, xml_path, active_mod_ids
+        logger.warning(
+            "Previous session didn't roll back its BTM changes, doing it now"
+        )
+        cls.rollback_journal()
+
+    @classmethod
+    def configure(cls, max_workers: int) -> None:
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be >= 1, got {max_workers}")
+
+        cls.shutdown()
+        cls.max_workers = max_workers
+
+    @classmethod
+    def shutdown(cls) -> None:
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown()
+                cls._executor = None
+
+    @classmethod
+    def _submit(cls, work: Callable, args: tuple) -> Future:
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.max_workers, thread_name_prefix="PartsManager"
                 )
 
-    @staticmethod
-    def rollback_chenges(mod: ModUnit):
-        PartsManager._fix_xml_by_config(mod.path)
+            executor = cls._executor
 
-        for xml_path in mod.path.rglob("*.xml"):
-            if xml_path.name.lower() in AppConfig.xml_system_dirs:
-                continue
+        try:
+            return executor.submit(work, *args)
 
-            with ThreadPoolExecutor() as executor:
-                executor.submit(PartsManager._fix_xml_by_commits, xml_path)
+        except RuntimeError:
+            # The interpreter is shutting down (atexit), run in place.
+            future: Future = Future()
+            try:
+                future.set_result(work(*args))
 
-    @staticmethod
-    def rollback_changes_no_thread(mod: ModUnit):
-        PartsManager._fix_xml_by_config(mod.path)
+            except Exception as err:
+                future.set_exception(err)
 
-        for xml_path in mod.path.rglob("*.xml"):
-            if xml_path.name.lower() in AppConfig.xml_system_dirs:
-                continue
+            return future
 
-            PartsManager._fix_xml_by_commits(xml_path)
+    @classmethod
+    def _run(cls, tasks: List[_ToggleTask]) -> List[Tuple[Any, ToggleResult]]:
+        # Every file is its own task: one large mod doesn't hold up the rest,
+        # and the pool size alone bounds how many files are open at once.
+        futures = [cls._submit(work, args) for _, _, work, args in tasks]
 
-    @staticmethod
-    def _corrupt_xml_by_commits(file_path: Path, active_mod_ids: Set[str]):
-        PartsManager._by_xml(file_path, active_mod_ids)
+        results = []
+        for (mod_id, path, _, _), future in zip(tasks, futures):
+            try:
+                results.append((future.result(), ToggleResult(mod_id, path)))
 
-    @staticmethod
-    def _corrupt_xml_by_config(mod_path: Path, active_mod_ids: Set[str]):
-        PartsManager._by_config(mod_path, active_mod_ids)
+            except Exception as err:
+                logger.error(
+                    f"Failed to toggle mod parts\n|Mod: {mod_id}\n|Path: {path}\n|Error: {err}"
+                )
+                results.append((None, ToggleResult(mod_id, path, str(err))))
+
+        return results
 
     @staticmethod
-    def _fix_xml_by_commits(file_path: Path):
-        PartsManager._by_xml(file_path, is_fix=True)
+    def _rename_tasks(mod_ids: Dict[Path, str], every_mod: bool) -> List[_ToggleTask]:
+        return [
+            (
+                mod_ids.get(mod_path, ""),
+                path,
+                PartsManager._restore_file_name,
+                (path, renamed),
+            )
+            for path, renamed, mod_path in ToggleJournal.renames()
+            if every_mod or mod_path in mod_ids
+        ]
 
     @staticmethod
-    def _fix_xml_by_config(mod_path: Path):
-        PartsManager._by_config(mod_path, is_fix=True)
+    def _config_tasks(plan: TogglePlan) -> List[_ToggleTask]:
+        return [
+            (
+                mod_id,
+                mod_path / "modparts.xml",
+                PartsManager._by_config,
+                (mod_path, plan.active_mod_ids, plan.is_fix),
+            )
+            for mod_path, mod_id in plan.config_mods.items()
+        ]
 
     @staticmethod
-    def _by_xml(
-        file_path: Path, active_mod_ids: Set[str] = set(), is_fix: bool = False
-    ):
-        xml_obj = XMLBuilder.load(file_path)
-        if xml_obj is None:
-            return
+    def _file_tasks(plan: TogglePlan, work: Callable) -> List[_ToggleTask]:
+        return [
+            (changes[0].mod_id, path, work, (path, changes))
+            for path, changes in plan.by_file().items()
+        ]
+
+    @classmethod
+    def _plan(
+        cls, mods: Iterable[ModUnit], active_mod_ids: ModIdSet, is_fix: bool
+    ) -> TogglePlan:
+        plan = TogglePlan(is_fix, active_mod_ids)
+        tasks: List[_ToggleTask] = []
+        for mod in mods:
+            for xml_file in mod.inventory.get_files(".xml"):
+                xml_path = xml_file.path
+                name = xml_path.name.lower()
+                if name == "modparts.xml":
+                    plan.config_mods[mod.path] = mod.id
+                    continue
 
-        for com_start, objs, com_end in xml_obj.find_between_comments(
-            "BTM:.*start", "BTM:.*end"
-        ):
-            if not is_fix:
-                match = re.search(r'conditions="(.*?)"', com_start.content)
-                if match:
-                    condition_value = match.group(1)
-                else:
-                    logger.error(
-                        f"Error in searching for switching conditions value\n|Path: {file_path}"
-                    )
+                if name in AppConfig.xml_system_dirs:
                     continue
 
-            match = re.search(r'setState="(.*?)"', com_start.content)
-            if match:
-                set_to = (
-                    not is_fix
-                    if match.group(1).lower() in ["on", "1", "true"]
-                    else is_fix
+                # Known to have no BTM: marker from the id scan, not even opened
+                if xml_file.has_toggle_marker is False:
+                    continue
+
+                tasks.append(
+                    (
+                        mod.id,
+                        xml_path,
+                        cls._plan_file,
+                        (mod.id, xml_file, active_mod_ids, is_fix),
+                    )
                 )
+
+        for changes, result in cls._run(tasks):
+            if result.ok:
+                plan.changes.extend(changes)
+
             else:
-                logger.error(
-                    f"Error in searching for set state value\n|Path: {file_path}"
-                )
+                plan.errors.append(result)
+
+        return plan
+
+    @staticmethod
+    def _plan_file(
+        mod_id: str, xml_file: InventoryFile, active_mod_ids: ModIdSet, is_fix: bool
+    ) -> List[ToggleChange]:
+        try:
+            if xml_file.has_toggle_marker is None:
+                xml_file.has_toggle_marker = has_toggle_marker(xml_file.path)
+
+            if not xml_file.has_toggle_marker:
+                return []
+
+            return PartsManager._plan_path(
+                mod_id, xml_file.path, active_mod_ids, is_fix
+            )
+
+        except FileNotFoundError:
+            # Renamed to .xml_off by an entry of modparts.xml
+            return []
+
+    @staticmethod
+    def _plan_path(
+        mod_id: str, file_path: Path, active_mod_ids: ModIdSet, is_fix: bool
+    ) -> List[ToggleChange]:
+        data = file_path.read_bytes()
+        changes: List[ToggleChange] = []
+        for region_index, region in enumerate(find_regions(data)):
+            set_to = PartsManager._region_state(
+                region, file_path, active_mod_ids, is_fix
+            )
+            if set_to is None:
                 continue
 
-            if not is_fix:
-                if not process_condition(  # ERROR
-                    condition_value,  # type: ignore
-                    active_mod_ids=active_mod_ids,
-                ):
+            skipped = []
+            for part_index, part in enumerate(region.parts):
+                if part.is_on == set_to:
                     continue
 
-            for obj in objs:
-                if obj.index is None:
+                if region.switch(data, part_index, set_to) is None:
+                    if not set_to:
+                        skipped.append(part_index)
+
                     continue
 
-                if set_to:
-                    if isinstance(obj, XMLElement):
-                        continue
+                changes.append(
+                    ToggleChange(
+                        mod_id,
+                        file_path,
+                        region_index,
+                        part_index,
+                        region.header,
+                        part.is_on,
+                        set_to,
+                    )
+                )
 
-                else:
-                    if isinstance(obj, XMLComment):
-                        continue
+            if skipped:
+                logger.warning(
+                    f"Unable to switch parts of a BTM region\n|Path: {file_path}\n|Region: {region.header}\n|Parts: {skipped}"
+                )
 
-                try:
-                    if isinstance(obj, XMLComment):
-                        xml_obj.replace(obj.index, obj.to_element())
-                    else:
-                        xml_obj.replace(obj.index, obj.to_comment())
+        return changes
 
-                except Exception:
-                    continue
+    @staticmethod
+    def _apply_file(file_path: Path, changes: List[ToggleChange]) -> bool:
+        """Switch the planned parts of one file.
+
+        Returns False if the file no longer matches the plan (edited or
+        replaced in between), parts that don't match are left alone.
+        """
+        # Only the bytes of the switched parts change, the rest of the file
+        # is written back exactly as the modder left it.
+        data = file_path.read_bytes()
+        regions = find_regions(data)
+        edits: List[Edit] = []
+        matches = True
+        for change in changes:
+            if (
+                change.region >= len(regions)
+                or regions[change.region].header != change.region_header
+                or change.part >= len(regions[change.region].parts)
+            ):
+                matches = False
+                continue
+
+            region = regions[change.region]
+            if region.parts[change.part].is_on != change.old_state:
+                continue
 
-        XMLBuilder.save(xml_obj, file_path)
+            edit = region.switch(data, change.part, change.new_state)
+            if edit is not None:
+                edits.append(edit)
+
+        if edits:
+            write_atomic(file_path, splice(data, edits))
+
+        return matches
+
+    @staticmethod
+    def _replay_file(file_path: Path, changes: List[ToggleChange]) -> None:
+        try:
+            matches = PartsManager._apply_file(file_path, changes)
+
+        except FileNotFoundError:
+            # The mod was deleted or unsubscribed, there is nothing left to
+            # restore and the entry is dropped with the rest of the journal.
+            logger.info(f"Journaled file no longer exists\n|Path: {file_path}")
+            return
+
+        if not matches:
+            # Edited or replaced since it was switched, fall back to the
+            # setState of every region.
+            PartsManager._by_xml(file_path, is_fix=True)
+
+    @staticmethod
+    def _by_xml(
+        file_path: Path,
+        active_mod_ids: Optional[ModIdSet] = None,
+        is_fix: bool = False,
+    ):
+        if active_mod_ids is None:
+            active_mod_ids = ModIdSet()
+
+        PartsManager._apply_file(
+            file_path, PartsManager._plan_path("", file_path, active_mod_ids, is_fix)
+        )
+
+    @staticmethod
+    def _region_state(
+        region: ToggleRegion, file_path: Path, active_mod_ids: ModIdSet, is_fix: bool
+    ) -> Optional[bool]:
+        """State the region's parts should end up in, None to leave them be."""
+        if not is_fix:
+            match = re.search(r'conditions="(.*?)"', region.header)
+            if match:
+                condition_value = match.group(1)
+            else:
+                logger.error(
+                    f"Error in searching for switching conditions value\n|Path: {file_path}"
+                )
+                return None
+
+        match = re.search(r'setState="(.*?)"', region.header)
+        if match:
+            set_to = (
+                not is_fix if match.group(1).lower() in ["on", "1", "true"] else is_fix
+            )
+        else:
+            logger.error(f"Error in searching for set state value\n|Path: {file_path}")
+            return None
+
+        if not is_fix:
+            if not process_condition(
+                condition_value,  # type: ignore
+                active_mod_ids=active_mod_ids,
+            ):
+                return None
+
+        return set_to
 
     @staticmethod
     def _by_config(
-        mod_path: Path, active_mod_ids: Set[str] = set(), is_fix: bool = False
+        mod_path: Path,
+        active_mod_ids: Optional[ModIdSet] = None,
+        is_fix: bool = False,
     ):
+        if active_mod_ids is None:
+            active_mod_ids = ModIdSet()
+
         xml_obj = XMLBuilder.load((mod_path / "modparts.xml"))
-        xml_file_list = XMLBuilder.load((mod_path / "filelist.xml"))
+        if xml_obj is None:
+            return
 
-        if not all((xml_obj, xml_file_list)):
+        xml_file_list = XMLBuilder.load((mod_path / "filelist.xml"))
+        if xml_file_list is None:
             return
 
+        entries = PartsManager._index_filelist(xml_file_list)
+        changed = False
+
         for action in xml_obj.iter_non_comment_childrens():  # type: ignore
             if not is_fix:
                 if not process_condition(
@@ -158,61 +473,126 @@ class PartsManager:
 
             set_to = not is_fix if set_to in ["on", "1", "true"] else is_fix
 
-            for item in xml_file_list.childrens:  # type: ignore # TODO Think about optimization
-                if isinstance(item, XMLComment):
-                    try:
-                        tmp_item = item.to_element()
+            key = (cond_type, PartsManager._normalize_file(path_to_file))
+            for index, item_file in entries.get(key, ()):
+                item = xml_file_list.childrens[index]
+                if set_to == isinstance(item, XMLElement):
+                    continue
 
-                    except Exception:
-                        continue
+                try:
+                    if isinstance(item, XMLComment):
+                        xml_file_list.replace(index, item.to_element())
 
-                else:
-                    tmp_item = item
+                    else:
+                        xml_file_list.replace(index, item.to_comment())
+
+                    changed = True
+                    # Rollback leaves the file names to the journal, it only
+                    # brings filelist.xml back.
+                    if not is_fix:
+                        PartsManager._rename_content_file(
+                            PartsManager._resolve_file(item_file, mod_path),
+                            mod_path,
+                            set_to,
+                        )
 
-                tag_item = tmp_item.tag
-                item_file = tmp_item.get_attribute_ignore_case("file")
-                if not all((tag_item, item_file)):
+                except Exception:
                     continue
 
-                if set_to:
-                    if isinstance(item, XMLElement):
-                        continue
+        if changed:
+            XMLBuilder.save(xml_file_list, (mod_path / "filelist.xml"))
 
-                else:
-                    if isinstance(item, XMLComment):
-                        continue
-
-                if tag_item == cond_type and item_file == path_to_file:
-                    try:
-                        if isinstance(item, XMLComment):
-                            xml_file_list.replace(item.index, item.to_element())  # type: ignore
-                            path_to_file.replace(  # type: ignore
-                                "%ModDir%",
-                                AppConfig.get_steam_mod_path(),  # type: ignore
-                            )
-                            path_to_file.replace(  # type: ignore
-                                "LocalMods",
-                                AppConfig.get_local_mod_path(),  # type: ignore
-                            )
-                            path_xml = Path(path_to_file)  # type: ignore
-                            if path_xml.exists():
-                                path_xml.rename(path_xml.stem + "xml_off")
-
-                        else:
-                            xml_file_list.replace(item.index, item.to_comment())  # type: ignore
-                            path_to_file.replace(  # type: ignore
-                                "%ModDir%",
-                                AppConfig.get_steam_mod_path(),  # type: ignore
-                            )
-                            path_to_file.replace(  # type: ignore
-                                "LocalMods",
-                                AppConfig.get_local_mod_path(),  # type: ignore
-                            )
-                            path_xml = Path(path_to_file)  # type: ignore
-                            if path_xml.exists():
-                                path_xml.rename(path_xml.stem + "xml")
-
-                    except Exception:
-                        continue
-
-        XMLBuilder.save(xml_file_list, (mod_path / "filelist.xml"))  # type: ignore
+    @staticmethod
+    def _index_filelist(
+        xml_file_list: XMLElement,
+    ) -> Dict[Tuple[str, str], List[Tuple[int, str]]]:
+        # (tag, normalized file) -> (child index, file as written) of every
+        # entry listing it, on or off. Each commented entry is parsed once
+        # here instead of once per action.
+        entries: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        for index, item in enumerate(xml_file_list.childrens):
+            if isinstance(item, XMLComment):
+                try:
+                    item = item.to_element()
+
+                except Exception:
+                    continue
+
+            item_file = item.get_attribute_ignore_case("file")
+            if not (item.tag and item_file):
+                continue
+
+            key = (item.tag, PartsManager._normalize_file(item_file))
+            entries.setdefault(key, []).append((index, item_file))
+
+        return entries
+
+    @staticmethod
+    def _normalize_file(path: str) -> str:
+        # The game runs on Windows first, mods mix separators and case freely.
+        return path.strip().replace("\\", "/").lower()
+
+    @staticmethod
+    def _resolve_file(path: str, mod_path: Path) -> Optional[Path]:
+        """The mod's own file an entry points at, None for anything else.
+
+        %ModDir% is the mod's folder, other paths are relative to the game
+        folder. Game content and other mods' files are never returned.
+        """
+        path = path.strip().replace("\\", "/")
+        if path.lower().startswith("%moddir%"):
+            file_path = mod_path / path[len("%ModDir%") :].lstrip("/")
+
+        elif path.startswith("%"):
+            return None
+
+        else:
+            game_path = AppConfig.get_game_path()
+            if game_path is None:
+                return None
+
+            file_path = game_path / path
+
+        try:
+            file_path.resolve().relative_to(mod_path.resolve())
+
+        except ValueError:
+            return None
+
+        return file_path
+
+    @staticmethod
+    def _rename_content_file(
+        path: Optional[Path], mod_path: Path, set_to: bool
+    ) -> None:
+        # An entry switched off also hides its file as .xml_off, so the id
+        # scan stops reading what the game no longer loads. Only renames the
+        # journal holds are ever undone, files shipped as .xml_off stay.
+        if path is None:
+            return
+
+        if set_to:
+            renamed = ToggleJournal.renamed_path(path)
+            if renamed is not None:
+                PartsManager._restore_file_name(path, renamed)
+
+            return
+
+        if not path.exists():
+            return
+
+        off_path = path.with_suffix(".xml_off")
+        ToggleJournal.record_rename(path, off_path, mod_path)
+        try:
+            path.rename(off_path)
+
+        except OSError:
+            ToggleJournal.forget_rename(path)
+            raise
+
+    @staticmethod
+    def _restore_file_name(path: Path, renamed: Path) -> None:
+        if renamed.exists() and not path.exists():
+            renamed.rename(path)
+
+        ToggleJournal.forget_rename(path)
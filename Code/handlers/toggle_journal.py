@@ -0,0 +1,217 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from Code.app_vars import AppConfig
+
+from .toggle_regions import ToggleChange, write_atomic
+
+logger = logging.getLogger(__name__)
+
+_JOURNAL_FORMAT = 1
+
+# (region, part) -> (region header, state the part was shipped in)
+_FileParts = Dict[Tuple[int, int], Tuple[str, bool]]
+
+
+# Every BTM part switched away from its shipped state, every mod whose
+# modparts.xml was applied to filelist.xml and every file hidden as .xml_off.
+# Saved to the user data dir before any file is written, so a session that
+# never reached _on_exit is rolled back on the next start.
+class ToggleJournal:
+    # file -> (mod id, its switched parts)
+    _files: Dict[Path, Tuple[str, _FileParts]] = {}
+    # mod path -> mod id
+    _configs: Dict[Path, str] = {}
+    # file -> (its .xml_off name, mod path)
+    _renames: Dict[Path, Tuple[Path, Path]] = {}
+    _loaded: bool = False
+    _lock = threading.RLock()
+
+    @classmethod
+    def record(
+        cls, changes: List[ToggleChange], config_mods: Dict[Path, str], is_fix: bool
+    ) -> None:
+        with cls._lock:
+            cls._load()
+            for change in changes:
+                mod_id, parts = cls._files.setdefault(change.path, (change.mod_id, {}))
+                key = (change.region, change.part)
+                _, shipped = parts.get(key, (change.region_header, change.old_state))
+                if change.new_state == shipped:
+                    parts.pop(key, None)
+                    if not parts:
+                        del cls._files[change.path]
+
+                else:
+                    parts[key] = (change.region_header, shipped)
+
+            for mod_path, mod_id in config_mods.items():
+                if is_fix:
+                    cls._configs.pop(mod_path, None)
+
+                else:
+                    cls._configs[mod_path] = mod_id
+
+            cls._save()
+
+    @classmethod
+    def is_empty(cls) -> bool:
+        with cls._lock:
+            cls._load()
+            return not (cls._files or cls._configs or cls._renames)
+
+    @classmethod
+    def record_rename(cls, path: Path, renamed: Path, mod_path: Path) -> None:
+        """Called before the file is renamed, so a crash can't lose it."""
+        with cls._lock:
+            cls._load()
+            cls._renames[path] = (renamed, mod_path)
+            cls._save()
+
+    @classmethod
+    def forget_rename(cls, path: Path) -> None:
+        with cls._lock:
+            cls._load()
+            if cls._renames.pop(path, None) is not None:
+                cls._save()
+
+    @classmethod
+    def renamed_path(cls, path: Path) -> Optional[Path]:
+        with cls._lock:
+            cls._load()
+            entry = cls._renames.get(path)
+            return None if entry is None else entry[0]
+
+    @classmethod
+    def renames(cls) -> List[Tuple[Path, Path, Path]]:
+        """(file, its .xml_off name, mod path) of every recorded rename."""
+        with cls._lock:
+            cls._load()
+            return [
+                (path, renamed, mod_path)
+                for path, (renamed, mod_path) in cls._renames.items()
+            ]
+
+    @classmethod
+    def take(cls) -> Tuple[List[ToggleChange], Dict[Path, str]]:
+        """Changes undoing everything recorded, and the mods to restore the
+        filelist.xml of. The journal itself is left as is until clear()."""
+        with cls._lock:
+            cls._load()
+            changes = [
+                ToggleChange(mod_id, path, region, part, header, not shipped, shipped)
+                for path, (mod_id, parts) in cls._files.items()
+                for (region, part), (header, shipped) in parts.items()
+            ]
+            return changes, dict(cls._configs)
+
+    @classmethod
+    def retain(cls, file_paths: Set[Path], mod_paths: Set[Path]) -> None:
+        """Drop everything but the given files and filelist.xml mods.
+
+        Renames are kept, each one is forgotten once it has been undone."""
+        with cls._lock:
+            cls._load()
+            cls._files = {
+                path: entry for path, entry in cls._files.items() if path in file_paths
+            }
+            cls._configs = {
+                path: mod_id
+                for path, mod_id in cls._configs.items()
+                if path in mod_paths
+            }
+            cls._save()
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._files = {}
+            cls._configs = {}
+            cls._renames = {}
+            cls._loaded = True
+            path = cls._get_path()
+            if path is not None:
+                path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _get_path() -> Optional[Path]:
+        user_data_path = AppConfig.get_user_data_path()
+        if user_data_path == Path():
+            return None
+
+        return user_data_path / "toggle_journal.json"
+
+    @classmethod
+    def _load(cls) -> None:
+        if cls._loaded:
+            return
+
+        cls._loaded = True
+        path = cls._get_path()
+        if path is None or not path.exists():
+            return
+
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("format") != _JOURNAL_FORMAT:
+                raise ValueError(f"Unknown journal format {data.get('format')}")
+
+            for entry in data["files"]:
+                parts = {
+                    (region, part): (header, shipped)
+                    for region, part, header, shipped in entry["parts"]
+                }
+                cls._files[Path(entry["path"])] = (entry["mod_id"], parts)
+
+            for entry in data["configs"]:
+                cls._configs[Path(entry["path"])] = entry["mod_id"]
+
+            for entry in data.get("renames", []):
+                cls._renames[Path(entry["path"])] = (
+                    Path(entry["renamed"]),
+                    Path(entry["mod_path"]),
+                )
+
+        except Exception as err:
+            logger.error(f"Invalid toggle journal\n|Path: {path}\n|Error: {err}")
+
+    @classmethod
+    def _save(cls) -> None:
+        path = cls._get_path()
+        if path is None:
+            return
+
+        if not (cls._files or cls._configs or cls._renames):
+            path.unlink(missing_ok=True)
+            return
+
+        data = {
+            "format": _JOURNAL_FORMAT,
+            "files": [
+                {
+                    "path": str(file_path),
+                    "mod_id": mod_id,
+                    "parts": [
+                        [region, part, header, shipped]
+                        for (region, part), (header, shipped) in parts.items()
+                    ],
+                }
+                for file_path, (mod_id, parts) in cls._files.items()
+            ],
+            "configs": [
+                {"path": str(mod_path), "mod_id": mod_id}
+                for mod_path, mod_id in cls._configs.items()
+            ],
+            "renames": [
+                {"path": str(path), "renamed": str(renamed), "mod_path": str(mod_path)}
+                for path, (renamed, mod_path) in cls._renames.items()
+            ],
+        }
+        try:
+            write_atomic(path, json.dumps(data, indent=1).encode("utf-8"))
+
+        except OSError as err:
+            logger.error(f"Unable to save toggle journal\n|Path: {path}\n|Error: {err}")
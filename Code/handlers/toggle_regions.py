@@ -0,0 +1,179 @@
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from Code.xml_object import (
+    TOKEN_COMMENT,
+    TOKEN_END,
+    TOKEN_START,
+    XMLElement,
+    iter_tokens,
+)
+
+_REGION_START = re.compile("BTM:.*start")
+_REGION_END = re.compile("BTM:.*end")
+
+_COMMENT_OPEN = b"<!--"
+_COMMENT_CLOSE = b"-->"
+
+# (start, end, replacement) - byte range of the file and the bytes replacing it
+Edit = Tuple[int, int, bytes]
+
+
+@dataclass
+class TogglePart:
+    # Byte range of one root child between the BTM markers
+    start: int
+    end: int
+    # True if the part is currently commented out
+    is_comment: bool
+
+    @property
+    def is_on(self) -> bool:
+        return not self.is_comment
+
+
+@dataclass
+class ToggleRegion:
+    # Text of the "BTM: ... start" comment
+    header: str
+    parts: List[TogglePart] = field(default_factory=list)
+
+    def switch(self, data: bytes, index: int, set_to: bool) -> Optional[Edit]:
+        """Edit turning the part on (set_to) or off.
+
+        None if the part can't be switched: an element containing "--" can't
+        be commented out, and a comment that isn't XML is a plain note.
+        """
+        part = self.parts[index]
+        raw = data[part.start : part.end]
+        replacement = _uncomment(raw) if set_to else _comment(raw)
+        if replacement is None:
+            return None
+
+        return part.start, part.end, replacement
+
+
+@dataclass
+class ToggleChange:
+    mod_id: str
+    path: Path
+    # Position of the part: n-th BTM region of the file, n-th part inside it
+    region: int
+    part: int
+    # Start comment of the region, tells if the file was edited in between
+    region_header: str
+    # True for on, i.e. not commented out
+    old_state: bool
+    new_state: bool
+
+
+def find_regions(data: bytes) -> List[ToggleRegion]:
+    """BTM regions among the root's children, with the byte range of each part."""
+    regions: List[ToggleRegion] = []
+    current: Optional[ToggleRegion] = None
+    for start, end, comment in _root_children(data):
+        if comment is not None and current is None and _REGION_START.search(comment):
+            current = ToggleRegion(_decode(comment))
+
+        elif (
+            comment is not None and current is not None and _REGION_END.search(comment)
+        ):
+            regions.append(current)
+            current = None
+
+        elif current is not None:
+            current.parts.append(TogglePart(start, end, comment is not None))
+
+    return regions
+
+
+def splice(data: bytes, edits: List[Edit]) -> bytes:
+    chunks = []
+    position = 0
+    for start, end, replacement in sorted(edits):
+        chunks.append(data[position:start])
+        chunks.append(replacement)
+        position = end
+
+    chunks.append(data[position:])
+    return b"".join(chunks)
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    # A crash mid-write leaves either the old file or the new one, never half.
+    handle, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+
+        if path.exists():
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+
+        os.replace(temp_path, path)
+
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _root_children(data: bytes) -> Iterator[Tuple[int, int, Optional[str]]]:
+    # latin-1 maps every byte to one character, so token positions are byte
+    # offsets. Yields (start, end, comment text or None for elements).
+    text = data.decode("latin-1")
+    depth = 0
+    element_start = 0
+    for kind, value, _, self_closing, start, end in iter_tokens(text):
+        if kind == TOKEN_START:
+            if self_closing:
+                if depth == 1:
+                    yield start, end, None
+
+                continue
+
+            if depth == 1:
+                element_start = start
+
+            depth += 1
+
+        elif kind == TOKEN_END:
+            depth -= 1
+            if depth == 1:
+                yield element_start, end, None
+
+        elif kind == TOKEN_COMMENT and depth == 1:
+            yield start, end, value
+
+
+def _decode(text: str) -> str:
+    return text.encode("latin-1").decode("utf-8", "replace")
+
+
+def _comment(raw: bytes) -> Optional[bytes]:
+    # "--" would end the new comment early
+    if b"--" in raw:
+        return None
+
+    return _COMMENT_OPEN + b" " + raw + b" " + _COMMENT_CLOSE
+
+
+def _uncomment(raw: bytes) -> Optional[bytes]:
+    inner = raw[len(_COMMENT_OPEN) : -len(_COMMENT_CLOSE)]
+    # Undo exactly the padding _comment() adds, the rest is kept as written.
+    if inner.startswith(b" "):
+        inner = inner[1:]
+
+    if inner.endswith(b" "):
+        inner = inner[:-1]
+
+    try:
+        if XMLElement.build_element(inner.decode("utf-8")) is None:
+            return None
+
+    except Exception:
+        return None
+
+    return inner
@@ -1,2 +1,10 @@
 from .dataclasses import Dependencie, Identifier, Metadata, ModUnit
-
+from .file_scanner import ScanPool, has_toggle_marker, scan_xml_file
+from .id_index import ID_ADD, ID_OVERRIDE, IdIndex
+from .id_loader import IdLoader
+from .id_table import IdSet, IdTable
+from .internal_library import InternalLibrary
+from .inventory import InventoryFile, ModInventory
+from .mod_id_set import ModIdSet
+from .mod_order import ModOrder
+from .scan_cache import FileScan, ScanCache
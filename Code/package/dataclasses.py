@@ -1,17 +1,29 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Set
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from Code.app_vars import AppConfig
 from Code.xml_object import XMLBuilder
 
-from .id_parser import extract_ids
+from .file_scanner import ScanPool, scan_xml_file
+from .id_table import IdSet
+from .internal_library import InternalLibrary
+from .inventory import InventoryFile, ModInventory
+from .metadata_reader import DEPENDENCY_TYPES, read_metadata
+from .scan_cache import FileScan, Fingerprint, ScanCache
 
 logger = logging.getLogger(__name__)
 
 
+def _done_future() -> Future:
+    future: Future = Future()
+    future.set_result(None)
+    return future
+
+
 class SkipLoadBuild(Exception):
     pass
 
@@ -67,12 +79,7 @@ class Dependencie(Identifier):
 
     @staticmethod
     def is_valid_type(value: str):
-        return value in {
-            "patch",
-            "requirement",
-            "requiredAnyOrder",
-            "conflict",
-        }
+        return value in DEPENDENCY_TYPES
 
 
 @dataclass
@@ -138,8 +145,25 @@ class ModUnit(Identifier):
 
     settings: Dict[str, Any]
 
-    add_id: Set[str]
-    override_id: Set[str]
+    add_id: IdSet
+    override_id: IdSet
+
+    inventory: ModInventory = field(
+        default_factory=ModInventory.create_empty, repr=False
+    )
+
+    # Warnings and errors written in the metadata itself, process_errors adds
+    # the dependency/override ones on top of these.
+    static_warnings: List[str] = field(default_factory=list, repr=False)
+    static_errors: List[str] = field(default_factory=list, repr=False)
+    meta_source: Tuple[Optional[Path], Optional[Fingerprint]] = field(
+        default=(None, None), repr=False
+    )
+    # Content scan state, see IdLoader. None until requested, a hand-made
+    # ModUnit counts as already scanned.
+    ids_future: Optional[Future] = field(
+        default_factory=_done_future, repr=False, compare=False
+    )
 
     @staticmethod
     def create_empty() -> "ModUnit":
@@ -155,8 +179,8 @@ class ModUnit(Identifier):
             False,
             False,
             {},
-            set(),
-            set(),
+            IdSet(),
+            IdSet(),
         )
 
     def get_str_path(self) -> str:
@@ -193,24 +217,38 @@ class ModUnit(Identifier):
             if "LocalMods" in path.parts:
                 obj.local = True
 
-            ModUnit.parse_filelist(obj, path)
+            if not ModUnit._restore_cached_meta(obj, path):
+                ModUnit.parse_filelist(obj, path)
+                metadata_path = None
+                if not obj.corepackage:
+                    metadata_path = ModUnit.parse_metadata(obj, path)
+
+                ModUnit._cache_meta(obj, path, metadata_path)
+
             if obj.corepackage:
+                ScanCache.flush()
                 logging.warning(
                     f"The program does not support core packages!\n|Mod details: '{obj.name}' | Steam ID: '{obj.steam_id}'"
                 )
                 return None
 
             obj.path = path
-            obj.use_lua = ModUnit.has_file(path, ".[Ll][Uu][Aa]")
+            obj.static_warnings = list(obj.metadata.warnings)
+            obj.static_errors = list(obj.metadata.errors)
+            obj.meta_source = obj._get_meta_source()
+
+            obj.inventory = ModInventory.build(path)
+            obj.use_lua = obj.inventory.has_extension(".lua")
             obj.use_cs = any(
                 [
-                    ModUnit.has_file(path, ".[Cc][Ss]"),
-                    ModUnit.has_file(path, ".[Dd][Ll][Ll]"),
+                    obj.inventory.has_extension(".cs"),
+                    obj.inventory.has_extension(".dll"),
                 ]
             )
 
-            ModUnit.parse_files(obj, path)
-            ModUnit.parse_metadata(obj, path)
+            # add_id/override_id are filled later by IdLoader.
+            obj.ids_future = None
+            ScanCache.flush()
 
             return obj
 
@@ -218,11 +256,56 @@ class ModUnit(Identifier):
             return None
 
     @staticmethod
-    def has_file(path: Path, extension: str) -> bool:
-        for file in path.rglob(f"*{extension}"):
-            return True
+    def _restore_cached_meta(obj: "ModUnit", path: Path) -> bool:
+        data = ScanCache.get_mod(path)
+        if data is None:
+            return False
+
+        metadata = data["metadata"]
+        metadata["dependencies"] = [
+            Dependencie(**dependency) for dependency in metadata["dependencies"]
+        ]
+
+        obj.name = data["name"]
+        obj.steam_id = data["steam_id"]
+        obj.corepackage = data["corepackage"]
+        obj.settings = data["settings"]
+        obj.metadata = Metadata(**metadata)
+        return True
 
-        return False
+    @staticmethod
+    def _cache_meta(obj: "ModUnit", path: Path, metadata_path: Optional[Path]) -> None:
+        sources = [path / "filelist.xml", path / "metadata.xml"]
+        if metadata_path is not None:
+            sources.append(metadata_path)
+
+        ScanCache.put_mod(
+            path,
+            sources,
+            {
+                "name": obj.name,
+                "steam_id": obj.steam_id,
+                "corepackage": obj.corepackage,
+                "settings": obj.settings,
+                "metadata": asdict(obj.metadata),
+            },
+        )
+
+    @staticmethod
+    def peek_id(path: Path) -> Optional[str]:
+        """Mod id from the filelist.xml root attributes alone, None if unreadable."""
+        try:
+            xml_obj = XMLBuilder.load_root(path / "filelist.xml")
+
+        except Exception:
+            return None
+
+        if xml_obj is None:
+            return None
+
+        return xml_obj.attributes.get("steamworkshopid") or xml_obj.attributes.get(
+            "name", "Something went rong"
+        )
 
     @staticmethod
     def parse_filelist(obj: "ModUnit", path: Path) -> None:
@@ -230,7 +313,7 @@ class ModUnit(Identifier):
         if not file_list_path.exists():
             raise ValueError(f"{file_list_path} don't exsist")
 
-        xml_obj = XMLBuilder.load(file_list_path)
+        xml_obj = XMLBuilder.load_root(file_list_path)
         if xml_obj is None:
             raise ValueError(f"{file_list_path} invalid xml struct")
 
@@ -248,148 +331,173 @@ class ModUnit(Identifier):
         )
 
     @staticmethod
-    def parse_files(obj: "ModUnit", path: Path) -> None:
-        xml_files_paths = path.rglob("*.[Xx][Mm][Ll]")
+    def load_ids(obj: "ModUnit", threaded: bool = True) -> None:
+        ModUnit.parse_files(obj, threaded)
+        ScanCache.flush()
+
+    @staticmethod
+    def parse_files(obj: "ModUnit", threaded: bool = True) -> None:
+        xml_files = obj.inventory.get_files(".xml")
+        if not threaded:
+            scans = [ModUnit._process_xml_file(xml_file, obj) for xml_file in xml_files]
+
+        elif ScanPool.is_enabled():
+            scans = ModUnit._parse_files_in_pool(obj, xml_files)
+
+        else:
+            with ThreadPoolExecutor() as executor:
+                scans = list(
+                    executor.map(
+                        lambda xml_file: ModUnit._process_xml_file(xml_file, obj),
+                        xml_files,
+                    )
+                )
 
-        with ThreadPoolExecutor() as executor:
-            for xml_file_path in xml_files_paths:
-                executor.submit(ModUnit._process_xml_file, xml_file_path, obj)
+        # The ids are interned once all files are in, instead of growing the
+        # compact sets file by file.
+        scans = [scan for scan in scans if scan is not None]
+        obj.add_id = IdSet(chain.from_iterable(scan.add_id for scan in scans))
+        obj.override_id = IdSet(chain.from_iterable(scan.override_id for scan in scans))
+        if any(scan.has_toggle_content for scan in scans):
+            obj.has_toggle_content = True
 
     @staticmethod
-    def _process_xml_file(xml_file_path: Path, obj: "ModUnit"):
-        try:
-            if xml_file_path.name.lower() == "modparts.xml":
-                obj.has_toggle_content = True
-                return
+    def _parse_files_in_pool(
+        obj: "ModUnit", xml_files: List[InventoryFile]
+    ) -> List[Optional[FileScan]]:
+        scans: List[Optional[FileScan]] = []
+        uncached = []
+        for xml_file in xml_files:
+            if not ModUnit._needs_scan(xml_file, obj):
+                continue
+
+            scan = ScanCache.get_file(xml_file.path, xml_file.fingerprint)
+            if scan is None:
+                uncached.append(xml_file)
 
-            if xml_file_path.name.lower() in AppConfig.xml_system_dirs:
-                return
+            else:
+                xml_file.has_toggle_marker = scan.has_toggle_content
+                scans.append(scan)
 
-            xml_obj = XMLBuilder.load(xml_file_path)
-            if xml_obj is None:
-                logger.warning(f"File {xml_file_path} is empty")
-                return
+        if not uncached:
+            return scans
 
-            id_parser_unit = extract_ids(xml_obj)
-            obj.add_id.update(id_parser_unit.add_id)
-            obj.override_id.update(id_parser_unit.override_id)
+        for xml_file, (scan, error) in ScanPool.scan_files(uncached):
+            if error is not None:
+                logger.error(error + f"\n|Mod: {obj!r}")
+                continue
 
-            if not obj.has_toggle_content:
-                for elem in xml_obj.find_only_comments("BTM:*"):
-                    obj.has_toggle_content = True
+            scans.append(ModUnit._store_scan(xml_file, scan))
+
+        return scans
+
+    @staticmethod
+    def _process_xml_file(
+        xml_file: InventoryFile, obj: "ModUnit"
+    ) -> Optional[FileScan]:
+        try:
+            if not ModUnit._needs_scan(xml_file, obj):
+                return None
+
+            scan = ScanCache.get_file(xml_file.path, xml_file.fingerprint)
+            if scan is None:
+                return ModUnit._store_scan(xml_file, scan_xml_file(xml_file.path))
+
+            xml_file.has_toggle_marker = scan.has_toggle_content
+            return scan
 
         except Exception as err:
             logger.error(str(err) + f"\n|Mod: {obj!r}")
+            return None
+
+    @staticmethod
+    def _needs_scan(xml_file: InventoryFile, obj: "ModUnit") -> bool:
+        file_name = xml_file.path.name.lower()
+        if file_name == "modparts.xml":
+            obj.has_toggle_content = True
+            return False
+
+        return file_name not in AppConfig.xml_system_dirs
+
+    @staticmethod
+    def _store_scan(
+        xml_file: InventoryFile, scan: Optional[FileScan]
+    ) -> Optional[FileScan]:
+        if scan is None:
+            logger.warning(f"File {xml_file.path} is empty")
+            return None
+
+        xml_file.has_toggle_marker = scan.has_toggle_content
+        ScanCache.put_file(xml_file.path, xml_file.fingerprint, scan)
+        return scan
 
     @staticmethod
-    def parse_metadata(obj: "ModUnit", path: Path) -> None:
+    def parse_metadata(obj: "ModUnit", path: Path) -> Optional[Path]:
         metadata_path = path / "metadata.xml"
 
-        if not metadata_path.exists():
-            search_pattern = f"{obj.id}.xml"
-            found_files = list(
-                (AppConfig.get_data_root_path() / "InternalLibrary").rglob(
-                    search_pattern
-                )
-            )
+        if metadata_path.exists():
+            xml_obj = XMLBuilder.load(metadata_path)
+            if xml_obj is None:
+                raise ValueError(f"Empty metadata.xml for {obj.id}!")
 
-            if found_files:
-                metadata_path = found_files[0]
+            record = read_metadata(xml_obj)
 
-            else:
-                return
+        else:
+            record = InternalLibrary.get_record(obj.id)
+            if record is None:
+                return None
 
-        xml_obj = XMLBuilder.load(metadata_path)
-        if xml_obj is None:
-            raise ValueError(f"Empty metadata.xml for {obj.id}!")
-
-        for element in xml_obj.iter_non_comment_childrens():
-            element_name_lower = element.tag.lower()
-
-            if element_name_lower == "settings":
-                for ch in element.iter_non_comment_childrens():
-                    setting_name = ch.attributes.get("name")
-                    if setting_name:
-                        obj.settings[setting_name] = ch.attributes.get("value")
-
-            if element_name_lower == "meta":
-                for ch in element.iter_non_comment_childrens():
-                    ch_name_lower = ch.tag.lower()
-                    if ch_name_lower == "author":
-                        obj.metadata.author_name = ch.content
-                    elif ch_name_lower == "license":
-                        obj.metadata.license = ch.content
-                    elif ch_name_lower == "warning":
-                        obj.metadata.warnings.extend(ch.content.strip().splitlines())
-                    elif ch_name_lower == "error":
-                        obj.metadata.errors.extend(ch.content.strip().splitlines())
-
-            if element_name_lower == "dependencies":
-                dependencies = []
-                for ch in element.iter_non_comment_childrens():
-                    dep_type = ch.tag
-
-                    if not Dependencie.is_valid_type(dep_type):
-                        logger.warning(
-                            f"Ignoring unsupported dependency type '{dep_type}' in {ch}"
-                        )
-                        continue
-
-                    name = ch.attributes.get("name")
-                    steam_id = ch.attributes.get("steamID")
-                    condition = ch.attributes.get("condition")
-
-                    if not name and not steam_id:
-                        logger.error(
-                            f"Dependency element missing 'name' or 'steamID' attribute in element {ch}"
-                        )
-                        continue
-
-                    add_attributes = ch.attributes.copy()
-                    add_attributes.pop("name", None)
-                    add_attributes.pop("steamID", None)
-                    add_attributes.pop("condition", None)
-
-                    dependency = Dependencie(
-                        name=name or "",
-                        steam_id=steam_id,
-                        type=dep_type,  # type: ignore
-                        attributes=add_attributes,
-                        condition=condition,
-                    )
-                    dependencies.append(dependency)
+            metadata_path = InternalLibrary.find_metadata(obj.id)
 
-                obj.metadata.dependencies.extend(dependencies)
+        ModUnit._apply_metadata(obj, record)
+        return metadata_path
 
-    def update_meta_errors(self) -> None:
+    @staticmethod
+    def _apply_metadata(obj: "ModUnit", record: Dict[str, Any]) -> None:
+        obj.settings.update(record["settings"])
+        if record["author_name"] is not None:
+            obj.metadata.author_name = record["author_name"]
+
+        if record["license"] is not None:
+            obj.metadata.license = record["license"]
+
+        obj.metadata.warnings.extend(record["warnings"])
+        obj.metadata.errors.extend(record["errors"])
+        obj.metadata.dependencies.extend(
+            Dependencie(**dependency) for dependency in record["dependencies"]
+        )
+
+    def _get_meta_source(self) -> Tuple[Optional[Path], Optional[Fingerprint]]:
         metadata_path = self.path / "metadata.xml"
+        fingerprint = ScanCache.fingerprint(metadata_path)
+        if fingerprint is not None:
+            return metadata_path, fingerprint
 
-        self.metadata.errors.clear()
-        self.metadata.warnings.clear()
+        # InternalLibrary entries are checked against their XMLs when the pack loads.
+        return InternalLibrary.find_metadata(self.id), None
 
-        if not metadata_path.exists():
-            search_pattern = f"{self.id}.xml"
-            found_files = list(
-                (AppConfig.get_data_root_path() / "InternalLibrary").rglob(
-                    search_pattern
-                )
-            )
+    def update_meta_errors(self) -> None:
+        meta_source = self._get_meta_source()
+        if meta_source != self.meta_source:
+            self._reload_static_meta(meta_source[0])
+            self.meta_source = meta_source
 
-            if found_files:
-                metadata_path = found_files[0]
+        self.metadata.warnings[:] = self.static_warnings
+        self.metadata.errors[:] = self.static_errors
 
-            else:
-                return
+    def _reload_static_meta(self, metadata_path: Optional[Path]) -> None:
+        if metadata_path is None:
+            record = None
 
-        xml_obj = XMLBuilder.load(metadata_path)
-        if xml_obj is None:
-            raise ValueError(f"Empty metadata.xml for {self.id}!")
+        elif metadata_path.parent == self.path:
+            xml_obj = XMLBuilder.load(metadata_path)
+            if xml_obj is None:
+                raise ValueError(f"Empty metadata.xml for {self.id}!")
+
+            record = read_metadata(xml_obj)
 
-        for element in xml_obj.find_only_elements("meta"):
-            for ch in element.iter_non_comment_childrens():
-                ch_name_lower = ch.tag.lower()
-                if ch_name_lower == "warning":
-                    self.metadata.warnings.extend(ch.content.strip().splitlines())
+        else:
+            record = InternalLibrary.get_record(self.id)
 
-                elif ch_name_lower == "error":
-                    self.metadata.errors.extend(ch.content.strip().splitlines())
+        self.static_warnings = list(record["warnings"]) if record else []
+        self.static_errors = list(record["errors"]) if record else []
@@ -0,0 +1,154 @@
+import logging
+import mmap
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Generator, Iterable, List, Optional, Tuple
+
+from Code.xml_object import TOKEN_COMMENT, XMLBuilder, XMLEvent
+
+from .id_parser import extract_ids_from_events
+from .inventory import InventoryFile
+from .scan_cache import FileScan
+
+logger = logging.getLogger(__name__)
+
+# (scan, error message)
+ScanResult = Tuple[Optional[FileScan], Optional[str]]
+
+# A batch is closed once it holds this many bytes of XML or this many files,
+# so one IPC round trip carries enough work to pay for itself.
+_BATCH_BYTES = 512 * 1024
+_BATCH_FILES = 64
+
+TOGGLE_MARKER = b"BTM:"
+
+
+def scan_xml_file(xml_file_path: Path) -> Optional[FileScan]:
+    scan = FileScan.create_empty()
+    events = XMLBuilder.iter_events(xml_file_path)
+    id_parser_unit = extract_ids_from_events(_watch_toggle_comments(events, scan))
+    if id_parser_unit is None:
+        return None
+
+    scan.add_id = id_parser_unit.add_id
+    scan.override_id = id_parser_unit.override_id
+    return scan
+
+
+def has_toggle_marker(xml_file_path: Path) -> bool:
+    """Raw byte search for a BTM: marker, the file is neither decoded nor parsed."""
+    with open(xml_file_path, "rb") as file:
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return view.find(TOGGLE_MARKER) != -1
+
+        except ValueError:
+            # Empty files can't be mapped
+            return False
+
+
+def _watch_toggle_comments(
+    events: Iterable[XMLEvent], scan: FileScan
+) -> Generator[XMLEvent, None, None]:
+    for event in events:
+        if event[0] == TOKEN_COMMENT and "BTM" in event[1]:
+            scan.has_toggle_content = True
+
+        yield event
+
+
+def _init_worker(log_level: int) -> None:
+    # Spawned workers start without the parent's logging setup.
+    if not logging.getLogger().handlers:
+        logging.basicConfig(
+            level=log_level,
+            format="[%(asctime)s][%(levelname)s] %(name)s: %(message)s",
+        )
+
+
+def _scan_batch(paths: List[str]) -> List[ScanResult]:
+    results: List[ScanResult] = []
+    for path in paths:
+        try:
+            results.append((scan_xml_file(Path(path)), None))
+
+        except Exception as err:
+            results.append((None, str(err)))
+
+    return results
+
+
+def make_batches(files: Iterable[InventoryFile]) -> List[List[InventoryFile]]:
+    batches: List[List[InventoryFile]] = []
+    batch: List[InventoryFile] = []
+    batch_bytes = 0
+    # Largest first, so the big files start early and the small ones fill in.
+    for xml_file in sorted(files, key=lambda file: file.size, reverse=True):
+        batch.append(xml_file)
+        batch_bytes += xml_file.size
+        if batch_bytes >= _BATCH_BYTES or len(batch) >= _BATCH_FILES:
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+class ScanPool:
+    jobs: int = 0
+
+    _executor: Optional[ProcessPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, jobs: int) -> None:
+        if jobs < 0:
+            raise ValueError(f"jobs must be >= 0, got {jobs}")
+
+        cls.shutdown()
+        cls.jobs = jobs
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return cls.jobs > 0
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        with cls._lock:
+            if cls._executor is None:
+                # Mods are built from several threads at once, fork would copy
+                # whatever locks those threads hold at that moment.
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=cls.jobs,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(logging.getLogger().getEffectiveLevel(),),
+                )
+                logger.debug(f"Scan pool started with {cls.jobs} workers")
+
+            return cls._executor
+
+    @classmethod
+    def scan_files(
+        cls, files: Iterable[InventoryFile]
+    ) -> Generator[Tuple[InventoryFile, ScanResult], None, None]:
+        executor = cls._get_executor()
+        submitted: List[Tuple[List[InventoryFile], Future]] = [
+            (batch, executor.submit(_scan_batch, [str(file.path) for file in batch]))
+            for batch in make_batches(files)
+        ]
+
+        for batch, future in submitted:
+            yield from zip(batch, future.result())
+
+    @classmethod
+    def shutdown(cls) -> None:
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(cancel_futures=True)
+                cls._executor = None
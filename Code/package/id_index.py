@@ -0,0 +1,194 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from .dataclasses import ModUnit
+from .id_loader import IdLoader
+from .mod_id_set import ModIdSet
+from .id_table import IdSet, IdTable
+from .mod_order import ModOrder
+
+ID_ADD = "add"
+ID_OVERRIDE = "override"
+
+_FLAGS = {ID_ADD: 1, ID_OVERRIDE: 2}
+
+# An identifier name or its IdTable number
+IdKey = Union[str, int]
+
+
+# Identifier -> mods that add or override it, over every scanned mod, active
+# or not. Updated per mod, so a lookup only costs the number of mods that
+# actually touch the identifier. Mods whose ids are not loaded yet wait in
+# _pending until a query needs them.
+class IdIndex:
+    _mods: Dict[str, ModUnit] = {}
+    _pending: Dict[str, ModUnit] = {}
+    _pending_ids = ModIdSet()
+    # IdTable number -> mod id -> _FLAGS bits, in the order mods were indexed
+    _entries: Dict[int, Dict[str, int]] = {}
+    # ID_* -> numbers used that way by more than one mod
+    _shared: Dict[str, Set[int]] = {ID_ADD: set(), ID_OVERRIDE: set()}
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._mods = {}
+        cls._pending = {}
+        cls._pending_ids = ModIdSet()
+        cls._entries = {}
+        cls._shared = {ID_ADD: set(), ID_OVERRIDE: set()}
+
+    @classmethod
+    def rebuild(cls, mods: Iterable[ModUnit]) -> None:
+        cls.clear()
+        for mod in mods:
+            cls.add_mod(mod)
+
+    @classmethod
+    def add_mod(cls, mod: ModUnit) -> None:
+        cls.remove_mod(mod.id)
+        if not IdLoader.is_loaded(mod):
+            cls._pending[mod.id] = mod
+            cls._pending_ids.add(mod.id)
+            return
+
+        cls._mods[mod.id] = mod
+        for kind, id_set in cls._ids_of(mod):
+            flag = _FLAGS[kind]
+            for number in id_set.numbers:
+                owners = cls._entries.setdefault(number, {})
+                owners[mod.id] = owners.get(mod.id, 0) | flag
+                cls._update_shared(number, kind)
+
+    @classmethod
+    def remove_mod(cls, mod_id: str) -> None:
+        # Uses the sets the mod was indexed with, so update_mod() has to run
+        # before the mod's ids are replaced, not after.
+        if cls._pending.pop(mod_id, None) is not None:
+            cls._pending_ids.discard(mod_id)
+
+        mod = cls._mods.pop(mod_id, None)
+        if mod is None:
+            return
+
+        for kind, id_set in cls._ids_of(mod):
+            for number in id_set.numbers:
+                owners = cls._entries.get(number)
+                if owners is None or mod_id not in owners:
+                    continue
+
+                owners[mod_id] &= ~_FLAGS[kind]
+                if not owners[mod_id]:
+                    del owners[mod_id]
+                    if not owners:
+                        del cls._entries[number]
+
+                cls._update_shared(number, kind)
+
+    @classmethod
+    def update_mod(cls, mod: ModUnit) -> None:
+        cls.remove_mod(mod.id)
+        cls.add_mod(mod)
+
+    @classmethod
+    def require(cls, mods: Iterable[ModUnit]) -> None:
+        """Load the ids of the given mods and make sure they are indexed."""
+        mods = [mod for mod in mods if cls._mods.get(mod.id) is not mod]
+        IdLoader.ensure(mods)
+        for mod in mods:
+            cls.add_mod(mod)
+
+    @classmethod
+    def _require_pending(cls, order: Optional[ModOrder] = None) -> None:
+        if order is None:
+            cls.require(list(cls._pending.values()))
+
+        elif cls._pending_ids.mask & order.ids.mask:
+            cls.require(
+                [cls._pending[mod_id] for mod_id in order.ids if mod_id in cls._pending]
+            )
+
+    @staticmethod
+    def _ids_of(mod: ModUnit) -> Tuple[Tuple[str, IdSet], ...]:
+        return ((ID_ADD, mod.add_id), (ID_OVERRIDE, mod.override_id))
+
+    @staticmethod
+    def _number(identifier: IdKey) -> Optional[int]:
+        if isinstance(identifier, int):
+            return identifier
+
+        return IdTable.lookup(identifier)
+
+    @classmethod
+    def _owners(cls, identifier: IdKey) -> Dict[str, int]:
+        number = cls._number(identifier)
+        return {} if number is None else cls._entries.get(number, {})
+
+    @classmethod
+    def _update_shared(cls, number: int, kind: str) -> None:
+        owners = cls._entries.get(number, {})
+        flag = _FLAGS[kind]
+        if len(owners) > 1 and sum(1 for f in owners.values() if f & flag) > 1:
+            cls._shared[kind].add(number)
+
+        else:
+            cls._shared[kind].discard(number)
+
+    @classmethod
+    def get(cls, identifier: IdKey) -> List[Tuple[ModUnit, str]]:
+        """Every (mod, ID_ADD/ID_OVERRIDE) pair that touches the identifier."""
+        cls._require_pending()
+        return [
+            (cls._mods[mod_id], kind)
+            for mod_id, flags in cls._owners(identifier).items()
+            for kind, flag in _FLAGS.items()
+            if flags & flag
+        ]
+
+    @classmethod
+    def find(
+        cls, identifier: IdKey, kind: str, order: Optional[ModOrder] = None
+    ) -> List[ModUnit]:
+        """Mods that add or override the identifier.
+
+        With an order only the mods in it are returned, in load order.
+        """
+        cls._require_pending(order)
+        return cls.find_loaded(identifier, kind, order)
+
+    @classmethod
+    def find_loaded(
+        cls, identifier: IdKey, kind: str, order: Optional[ModOrder] = None
+    ) -> List[ModUnit]:
+        """find() over the mods already indexed, never starts loading ids."""
+        flag = _FLAGS[kind]
+        mods = [
+            cls._mods[mod_id]
+            for mod_id, flags in cls._owners(identifier).items()
+            if flags & flag and (order is None or mod_id in order)
+        ]
+        if order is not None:
+            mods.sort(key=order.index)
+
+        return mods
+
+    @classmethod
+    def winner(cls, identifier: IdKey, order: ModOrder) -> Optional[ModUnit]:
+        """Mod whose definition the game ends up using for the identifier.
+
+        The last override in load order wins, otherwise the first mod adding it.
+        """
+        overriders = cls.find(identifier, ID_OVERRIDE, order)
+        if overriders:
+            return overriders[-1]
+
+        adders = cls.find(identifier, ID_ADD, order)
+        return adders[0] if adders else None
+
+    @classmethod
+    def shared(cls, kind: str, order: Optional[ModOrder] = None) -> List[str]:
+        """Identifiers that more than one scanned mod adds (or overrides).
+
+        With an order only the mods in it are loaded first, so this is a
+        superset of the ids they share; narrow it down with find().
+        """
+        cls._require_pending(order)
+        return sorted(map(IdTable.name, cls._shared[kind]))
@@ -0,0 +1,66 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from .dataclasses import ModUnit
+
+logger = logging.getLogger(__name__)
+
+
+# Second loading phase. ModUnit.build only reads filelist.xml, metadata and the
+# inventory; the content scan that fills add_id/override_id and
+# has_toggle_content runs here, one future per mod, the first time something
+# asks for it.
+class IdLoader:
+    _executor: Optional[ThreadPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def is_loaded(mod: ModUnit) -> bool:
+        return mod.ids_future is not None and mod.ids_future.done()
+
+    @classmethod
+    def request(cls, mod: ModUnit) -> Future:
+        """Start loading the mod's ids in the background, once."""
+        with cls._lock:
+            if mod.ids_future is not None:
+                return mod.ids_future
+
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(thread_name_prefix="IdLoader")
+
+            try:
+                mod.ids_future = cls._executor.submit(cls._load, mod)
+
+            except RuntimeError:
+                # The interpreter is shutting down (atexit), load in place.
+                mod.ids_future = Future()
+                cls._load(mod, threaded=False)
+                mod.ids_future.set_result(None)
+
+            return mod.ids_future
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Let the pool's threads exit: idle ones now, busy ones once the
+        loads already requested are done. A later request() starts a new pool.
+        """
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False)
+                cls._executor = None
+
+    @classmethod
+    def ensure(cls, mods: Iterable[ModUnit]) -> None:
+        """Block until every given mod has its ids, loading them in parallel."""
+        for future in [cls.request(mod) for mod in mods]:
+            future.result()
+
+    @staticmethod
+    def _load(mod: ModUnit, threaded: bool = True) -> None:
+        try:
+            ModUnit.load_ids(mod, threaded)
+
+        except Exception as err:
+            logger.error(f"Failed to load mod ids\n|Mod: {mod!r}\n|Error: {err}")
@@ -1,11 +1,15 @@
 import logging
 from dataclasses import dataclass
-from typing import List, Optional, Set, Tuple
+from typing import Iterable, List, Mapping, Optional, Set, Tuple
 
-from Code.xml_object import XMLElement
+from Code.xml_object import TOKEN_END, TOKEN_START, XMLElement, XMLEvent
 
 logger = logging.getLogger(__name__)
 
+# (is_override, context) the children of a tag are parsed with.
+# None means the children are not parsed at all.
+_Descend = Optional[Tuple[bool, Optional[str]]]
+
 
 @dataclass
 class IDParserUnit:
@@ -28,41 +32,70 @@ def extract_ids(obj: Optional[XMLElement]) -> IDParserUnit:
     return parsed_ids
 
 
+def extract_ids_from_events(events: Iterable[XMLEvent]) -> Optional[IDParserUnit]:
+    # Streaming counterpart of extract_ids: only the open elements are kept,
+    # one _Descend per nesting level. Returns None if there is no root element.
+    parsed_ids = IDParserUnit.create_empty()
+    stack: List[_Descend] = []
+    has_root = False
+
+    for kind, tag, attributes in events:
+        if kind == TOKEN_END:
+            stack.pop()
+            continue
+
+        if kind != TOKEN_START:
+            continue
+
+        if not stack:
+            if has_root:
+                break
+
+            has_root = True
+            if tag.lower() in ["infotext", "infotexts"]:
+                descend = None
+
+            else:
+                descend = _process_tag(tag, attributes, False, None, parsed_ids)  # type: ignore
+
+        elif stack[-1] is None:
+            descend = None
+
+        else:
+            descend = _process_tag(tag, attributes, *stack[-1], parsed_ids)  # type: ignore
+
+        stack.append(descend)
+
+    if not has_root:
+        return None
+
+    return parsed_ids
+
+
 def _context_rule(context_type: Optional[str] = None):
     def _rule(
-        obj: XMLElement,
-        stack: List[Tuple[XMLElement, bool, Optional[str]]],
+        tag: str,
+        attributes: Mapping[str, str],
         is_override: bool,
         id_parser_unit: IDParserUnit,
         current_context: Optional[str],
-    ):
+    ) -> _Descend:
         if context_type:
-            for child in obj.iter_non_comment_childrens():
-                if obj.tag.lower() == "override":
-                    stack.append((child, True, context_type))
-                    continue
-
-                stack.append((child, is_override, context_type))
+            return is_override, context_type
 
-        else:
-            for child in obj.iter_non_comment_childrens():
-                if obj.tag.lower() == "override":
-                    stack.append((child, True, current_context))
-                    continue
-
-                stack.append((child, is_override, current_context))
+        return is_override, current_context
 
     return _rule
 
 
 def _special_id_rule(name: str):
     def _rule(
-        obj: XMLElement,
-        stack: List[Tuple[XMLElement, bool, Optional[str]]],
+        tag: str,
+        attributes: Mapping[str, str],
         is_override: bool,
         id_parser_unit: IDParserUnit,
         current_context: Optional[str],
-    ):
+    ) -> _Descend:
         if is_override:
             id_parser_unit.override_id.add(name)
 
@@ -74,13 +107,13 @@ def _special_id_rule(name: str):
 
 def _id_rule(prefix: str, id_field: str = "identifier"):
     def _rule(
-        obj: XMLElement,
-        stack: List[Tuple[XMLElement, bool, Optional[str]]],
+        tag: str,
+        attributes: Mapping[str, str],
         is_override: bool,
         id_parser_unit: IDParserUnit,
         current_context: Optional[str],
-    ):
-        identifier = obj.attributes.get(id_field, obj.tag)
+    ) -> _Descend:
+        identifier = attributes.get(id_field, tag)
         full_id = f"{prefix}.{identifier}"
 
         if is_override:
@@ -99,16 +132,19 @@ def _ignore_rule():
     return _rule
 
 
-def _detect_animation(obj: XMLElement) -> Optional[str]:
-    animation_type = obj.get_attribute_ignore_case("animationtype")
+def _detect_animation(tag: str, attributes: Mapping[str, str]) -> Optional[str]:
+    animation_type = next(
+        (value for key, value in attributes.items() if key.lower() == "animationtype"),
+        None,
+    )
     if not animation_type:
         return None
 
     if animation_type in ["SwimSlow", "SwimFast"]:
-        return f"WaterAnimation.{obj.tag}"
+        return f"WaterAnimation.{tag}"
 
     if animation_type in ["Walk", "Run", "Crouch"]:
-        return f"GroundAnimation.{obj.tag}"
+        return f"GroundAnimation.{tag}"
 
     return None
 
@@ -217,44 +253,64 @@ def _parse_object(
 
     while processing_stack:
         current_obj, is_override, current_context = processing_stack.pop()
-        obj_name_lower = current_obj.tag.lower()
+        descend = _process_tag(
+            current_obj.tag,
+            current_obj.attributes_view,
+            is_override,
+            current_context,
+            id_parser_unit,
+        )
+        if descend is None:
+            continue
 
-        if obj_name_lower == "override":
-            for child in current_obj.iter_non_comment_childrens():
-                processing_stack.append((child, True, current_context))
+        for child in current_obj.iter_non_comment_childrens():
+            processing_stack.append((child, *descend))
 
-            continue
 
-        name_rule = _RULES.get(obj_name_lower)
-        if name_rule:
-            name_rule(
-                current_obj,
-                processing_stack,
+def _process_tag(
+    tag: str,
+    attributes: Mapping[str, str],
+    is_override: bool,
+    current_context: Optional[str],
+    id_parser_unit: IDParserUnit,
+) -> _Descend:
+    tag_lower = tag.lower()
+
+    if tag_lower == "override":
+        return True, current_context
+
+    name_rule = _RULES.get(tag_lower)
+    if name_rule:
+        return name_rule(
+            tag,
+            attributes,
+            is_override,
+            id_parser_unit,
+            current_context,
+        )
+
+    if current_context:
+        context_rule = _RULES.get(current_context)
+        if context_rule:
+            return context_rule(
+                tag,
+                attributes,
                 is_override,
                 id_parser_unit,
                 current_context,
             )
 
-        elif current_context:
-            context_rule = _RULES.get(current_context)
-            if context_rule:
-                context_rule(
-                    current_obj,
-                    processing_stack,
-                    is_override,
-                    id_parser_unit,
-                    current_context,
-                )
-
-            else:
-                _handle_animation(current_obj, is_override, id_parser_unit)
-
-        else:
-            _handle_animation(current_obj, is_override, id_parser_unit)
+    _handle_animation(tag, attributes, is_override, id_parser_unit)
+    return None
 
 
-def _handle_animation(obj: XMLElement, is_override: bool, id_parser_unit: IDParserUnit):
-    animation_id = _detect_animation(obj)
+def _handle_animation(
+    tag: str,
+    attributes: Mapping[str, str],
+    is_override: bool,
+    id_parser_unit: IDParserUnit,
+):
+    animation_id = _detect_animation(tag, attributes)
     if animation_id:
         if is_override:
             id_parser_unit.override_id.add(animation_id)
@@ -262,4 +318,4 @@ def _handle_animation(obj: XMLElement, is_override: bool, id_parser_unit: IDPars
             id_parser_unit.add_id.add(animation_id)
 
     else:
-        logger.warning(f"No rule found for object: {obj.tag} | {obj.tag.lower()}")
+        logger.warning(f"No rule found for object: {tag} | {tag.lower()}")
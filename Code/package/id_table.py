@@ -0,0 +1,112 @@
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+# Process-wide table giving every identifier string ("item.wrench") a small
+# int. Mods overriding the same vanilla content then share one string, and
+# per-mod id sets can be plain sorted int arrays.
+class IdTable:
+    _numbers: Dict[str, int] = {}
+    _names: List[str] = []
+    _lock = threading.Lock()
+
+    @staticmethod
+    def intern(name: str) -> int:
+        number = IdTable._numbers.get(name)
+        if number is None:
+            with IdTable._lock:
+                number = IdTable._numbers.setdefault(name, len(IdTable._names))
+                if number == len(IdTable._names):
+                    IdTable._names.append(name)
+
+        return number
+
+    @staticmethod
+    def intern_all(names: Iterable[str]) -> List[int]:
+        # One lock round for a whole mod instead of one per new id.
+        result = []
+        with IdTable._lock:
+            for name in names:
+                number = IdTable._numbers.get(name)
+                if number is None:
+                    number = len(IdTable._names)
+                    IdTable._numbers[name] = number
+                    IdTable._names.append(name)
+
+                result.append(number)
+
+        return result
+
+    @staticmethod
+    def lookup(name: str) -> Optional[int]:
+        return IdTable._numbers.get(name)
+
+    @staticmethod
+    def name(number: int) -> str:
+        return IdTable._names[number]
+
+    @staticmethod
+    def size() -> int:
+        return len(IdTable._names)
+
+
+# Immutable set of identifiers stored as a sorted array of IdTable numbers,
+# 4 bytes per entry. Iterating yields the names; `numbers` gives the ints.
+class IdSet:
+    __slots__ = ("numbers",)
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.numbers = array("I", sorted(set(IdTable.intern_all(names))))
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __iter__(self) -> Iterator[str]:
+        return map(IdTable.name, self.numbers)
+
+    def __contains__(self, name: object) -> bool:
+        number = IdTable.lookup(name) if isinstance(name, str) else None
+        return number is not None and self.has_number(number)
+
+    def has_number(self, number: int) -> bool:
+        i = bisect_left(self.numbers, number)
+        return i < len(self.numbers) and self.numbers[i] == number
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, IdSet):
+            return self.numbers == other.numbers
+
+        if isinstance(other, (set, frozenset)):
+            return len(other) == len(self) and all(name in self for name in other)
+
+        return NotImplemented
+
+    def __or__(self, other: "IdSet") -> "IdSet":
+        merged = IdSet()
+        merged.numbers = array("I", _merge(self.numbers, other.numbers))
+        return merged
+
+    def __repr__(self) -> str:
+        return f"IdSet({sorted(self)})"
+
+
+def _merge(a: array, b: array) -> Iterator[int]:
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            yield a[i]
+            i += 1
+
+        elif b[j] < a[i]:
+            yield b[j]
+            j += 1
+
+        else:
+            yield a[i]
+            i += 1
+            j += 1
+
+    yield from a[i:]
+    yield from b[j:]
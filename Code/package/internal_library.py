@@ -0,0 +1,261 @@
+import hashlib
+import json
+import logging
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from Code.app_vars import AppConfig
+from Code.xml_object import XMLBuilder
+
+from .inventory import InventoryFile, ModInventory
+from .metadata_reader import read_metadata
+
+logger = logging.getLogger(__name__)
+
+# Bump when the record layout produced by read_metadata changes.
+_PACK_FORMAT = 3
+_PACK_NAME = "InternalLibrary.pack.json"
+# Written into the library by --pack-library. In a frozen build, where nobody
+# edits the library, a pack carrying the same stamp is trusted without
+# walking it. Anywhere else the source XMLs are always checked.
+_STAMP_NAME = "library.stamp"
+
+
+class InternalLibrary:
+    _index: Optional[Dict[str, Path]] = None
+    _records: Dict[str, Optional[Dict[str, Any]]] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_root() -> Path:
+        return AppConfig.get_data_root_path() / "InternalLibrary"
+
+    @staticmethod
+    def get_pack_paths() -> List[Path]:
+        # The app folder may be read-only, the user data folder is the fallback.
+        paths = [AppConfig.get_data_root_path() / _PACK_NAME]
+        user_data_path = AppConfig.get_user_data_path()
+        if user_data_path != Path():
+            paths.append(user_data_path / _PACK_NAME)
+
+        return paths
+
+    @classmethod
+    def _load(cls) -> Dict[str, Path]:
+        with cls._lock:
+            if cls._index is None:
+                cls._index, cls._records = cls._load_pack(cls.get_root())
+
+            return cls._index
+
+    @classmethod
+    def _load_pack(
+        cls, root: Path
+    ) -> Tuple[Dict[str, Path], Dict[str, Optional[Dict[str, Any]]]]:
+        pack = cls._read_pack()
+        packed_sources = pack.get("sources", {})
+        packed_records = pack.get("mods", {})
+
+        stamp = cls._read_stamp(root)
+        if (
+            getattr(sys, "frozen", False)
+            and stamp is not None
+            and pack.get("stamp") == stamp
+        ):
+            index = {
+                mod_id: root / packed[0] for mod_id, packed in packed_sources.items()
+            }
+            return index, packed_records
+
+        sources, records = cls._scan(root, packed_sources, packed_records)
+        if (
+            sources != packed_sources
+            or records.keys() != packed_records.keys()
+            or pack.get("stamp") != stamp
+        ):
+            cls._write_pack(
+                {
+                    "format": _PACK_FORMAT,
+                    "stamp": stamp,
+                    "sources": sources,
+                    "mods": records,
+                }
+            )
+
+        index = {mod_id: root / packed[0] for mod_id, packed in sources.items()}
+        return index, records
+
+    @classmethod
+    def _scan(
+        cls,
+        root: Path,
+        packed_sources: Dict[str, List[Any]],
+        packed_records: Dict[str, Optional[Dict[str, Any]]],
+    ) -> Tuple[Dict[str, List[Any]], Dict[str, Optional[Dict[str, Any]]]]:
+        # An unchanged size and mtime reuse the record after a single stat.
+        # Extracting a release resets every mtime, so with the same size the
+        # content hash decides.
+        xml_files: Dict[str, InventoryFile] = {}
+        for xml_file in ModInventory.build(root).get_files(".xml"):
+            xml_files.setdefault(xml_file.path.stem, xml_file)
+
+        sources: Dict[str, List[Any]] = {}
+        records: Dict[str, Optional[Dict[str, Any]]] = {}
+        compiled = 0
+        for mod_id, xml_file in xml_files.items():
+            source = xml_file.path.relative_to(root).as_posix()
+            packed = packed_sources.get(mod_id)
+            if (
+                packed is not None
+                and packed[0] == source
+                and packed[1] == xml_file.size
+                and mod_id in packed_records
+            ):
+                if packed[2] == xml_file.mtime_ns:
+                    sources[mod_id] = packed
+                    records[mod_id] = packed_records[mod_id]
+                    continue
+
+                digest = cls._hash_file(xml_file.path)
+                if packed[3] == digest:
+                    sources[mod_id] = [source, xml_file.size, xml_file.mtime_ns, digest]
+                    records[mod_id] = packed_records[mod_id]
+                    continue
+
+            else:
+                digest = cls._hash_file(xml_file.path)
+
+            sources[mod_id] = [source, xml_file.size, xml_file.mtime_ns, digest]
+            records[mod_id] = cls._compile(xml_file.path)
+            compiled += 1
+
+        logger.debug(f"InternalLibrary pack: {compiled} entries recompiled")
+        return sources, records
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        try:
+            return hashlib.sha1(path.read_bytes()).hexdigest()
+
+        except OSError:
+            return ""
+
+    @staticmethod
+    def _read_stamp(root: Path) -> Optional[str]:
+        try:
+            return (root / _STAMP_NAME).read_text(encoding="utf-8").strip() or None
+
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write_stamp(root: Path, sources: Dict[str, List[Any]]) -> str:
+        # mtimes differ between checkouts, only names and contents count.
+        content = {
+            mod_id: [packed[0], packed[1], packed[3]]
+            for mod_id, packed in sources.items()
+        }
+        digest = hashlib.sha1(
+            json.dumps(content, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        (root / _STAMP_NAME).write_text(digest, encoding="utf-8")
+        return digest
+
+    @staticmethod
+    def _compile(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            xml_obj = XMLBuilder.load(path)
+
+        except Exception as err:
+            logger.error(
+                f"Unable to read InternalLibrary file\n|Path: {path}\n|Error: {err}"
+            )
+            return None
+
+        if xml_obj is None:
+            return None
+
+        return read_metadata(xml_obj)
+
+    @classmethod
+    def _read_pack(cls) -> Dict[str, Any]:
+        # Whichever pack was written last is the closest to the sources.
+        pack_paths = sorted(
+            (path for path in cls.get_pack_paths() if path.exists()),
+            key=lambda path: path.stat().st_mtime_ns,
+            reverse=True,
+        )
+        for pack_path in pack_paths:
+            try:
+                with open(pack_path, "r", encoding="utf-8") as file:
+                    pack = json.load(file)
+
+            except (OSError, ValueError) as err:
+                logger.warning(
+                    f"Ignoring unreadable InternalLibrary pack\n|Path: {pack_path}\n|Error: {err}"
+                )
+                continue
+
+            if pack.get("format") == _PACK_FORMAT:
+                return pack
+
+        return {}
+
+    @classmethod
+    def _write_pack(cls, pack: Dict[str, Any]) -> None:
+        for pack_path in cls.get_pack_paths():
+            try:
+                with open(pack_path, "w", encoding="utf-8") as file:
+                    json.dump(pack, file, ensure_ascii=False, separators=(",", ":"))
+
+                return
+
+            except OSError as err:
+                logger.debug(
+                    f"Unable to write InternalLibrary pack\n|Path: {pack_path}\n|Error: {err}"
+                )
+
+        logger.warning("InternalLibrary pack could not be saved")
+
+    @classmethod
+    def find_metadata(cls, mod_id: str) -> Optional[Path]:
+        return cls._load().get(mod_id)
+
+    @classmethod
+    def get_record(cls, mod_id: str) -> Optional[Dict[str, Any]]:
+        cls._load()
+        return cls._records.get(mod_id)
+
+    @classmethod
+    def build_pack(cls) -> int:
+        """Compile the library into the pack and stamp both with the same
+        version, so a release loads the pack without walking the library."""
+        root = cls.get_root()
+        with cls._lock:
+            pack = cls._read_pack()
+            sources, records = cls._scan(
+                root, pack.get("sources", {}), pack.get("mods", {})
+            )
+            stamp = cls._write_stamp(root, sources)
+            cls._write_pack(
+                {
+                    "format": _PACK_FORMAT,
+                    "stamp": stamp,
+                    "sources": sources,
+                    "mods": records,
+                }
+            )
+            cls._index = {
+                mod_id: root / packed[0] for mod_id, packed in sources.items()
+            }
+            cls._records = records
+
+        return len(cls._index)
+
+    @classmethod
+    def reload(cls) -> None:
+        with cls._lock:
+            cls._index = None
+            cls._records = {}
@@ -0,0 +1,71 @@
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class InventoryFile:
+    path: Path
+    size: int
+    mtime_ns: int
+    # Whether the file holds a BTM: comment, None until the file is scanned
+    has_toggle_marker: Optional[bool] = None
+
+    @property
+    def fingerprint(self) -> Tuple[int, int]:
+        return self.size, self.mtime_ns
+
+
+@dataclass
+class ModInventory:
+    root: Path
+    # lower-case extension with the dot (".xml") -> files
+    files: Dict[str, List[InventoryFile]]
+
+    @staticmethod
+    def create_empty() -> "ModInventory":
+        return ModInventory(Path(), {})
+
+    @staticmethod
+    def build(root: Path) -> "ModInventory":
+        files: Dict[str, List[InventoryFile]] = {}
+        directories = [str(root)]
+
+        while directories:
+            directory = directories.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        # Like rglob, symlinked directories aren't entered, a
+                        # link back up the tree would never end.
+                        if entry.is_dir(follow_symlinks=False):
+                            directories.append(entry.path)
+                            continue
+
+                        if not entry.is_file():
+                            continue
+
+                        stat = entry.stat()
+                        extension = os.path.splitext(entry.name)[1].lower()
+                        files.setdefault(extension, []).append(
+                            InventoryFile(
+                                Path(entry.path), stat.st_size, stat.st_mtime_ns
+                            )
+                        )
+
+            except OSError as err:
+                logger.warning(
+                    f"Unable to read directory\n|Path: {directory}\n|Error: {err}"
+                )
+
+        return ModInventory(root, files)
+
+    def has_extension(self, extension: str) -> bool:
+        return extension in self.files
+
+    def get_files(self, extension: str) -> List[InventoryFile]:
+        return self.files.get(extension, [])
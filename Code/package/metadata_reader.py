@@ -0,0 +1,83 @@
+import logging
+from typing import Any, Dict, List
+
+from Code.xml_object import XMLElement
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCY_TYPES = frozenset({"patch", "requirement", "requiredAnyOrder", "conflict"})
+
+
+def read_metadata(xml_obj: XMLElement) -> Dict[str, Any]:
+    """Plain, JSON-serializable view of a metadata.xml document."""
+    record: Dict[str, Any] = {
+        "settings": {},
+        "author_name": None,
+        "license": None,
+        "warnings": [],
+        "errors": [],
+        "dependencies": [],
+    }
+
+    for element in xml_obj.iter_non_comment_childrens():
+        element_name_lower = element.tag.lower()
+
+        if element_name_lower == "settings":
+            for ch in element.iter_non_comment_childrens():
+                setting_name = ch.attributes.get("name")
+                if setting_name:
+                    record["settings"][setting_name] = ch.attributes.get("value")
+
+        if element_name_lower == "meta":
+            for ch in element.iter_non_comment_childrens():
+                ch_name_lower = ch.tag.lower()
+                if ch_name_lower == "author":
+                    record["author_name"] = ch.content
+                elif ch_name_lower == "license":
+                    record["license"] = ch.content
+                elif ch_name_lower == "warning":
+                    record["warnings"].extend(ch.content.strip().splitlines())
+                elif ch_name_lower == "error":
+                    record["errors"].extend(ch.content.strip().splitlines())
+
+        if element_name_lower == "dependencies":
+            record["dependencies"].extend(_read_dependencies(element))
+
+    return record
+
+
+def _read_dependencies(element: XMLElement) -> List[Dict[str, Any]]:
+    dependencies = []
+    for ch in element.iter_non_comment_childrens():
+        dep_type = ch.tag
+
+        if dep_type not in DEPENDENCY_TYPES:
+            logger.warning(f"Ignoring unsupported dependency type '{dep_type}' in {ch}")
+            continue
+
+        name = ch.attributes.get("name")
+        steam_id = ch.attributes.get("steamID")
+        condition = ch.attributes.get("condition")
+
+        if not name and not steam_id:
+            logger.error(
+                f"Dependency element missing 'name' or 'steamID' attribute in element {ch}"
+            )
+            continue
+
+        add_attributes = ch.attributes.copy()
+        add_attributes.pop("name", None)
+        add_attributes.pop("steamID", None)
+        add_attributes.pop("condition", None)
+
+        dependencies.append(
+            {
+                "name": name or "",
+                "steam_id": steam_id,
+                "type": dep_type,
+                "attributes": add_attributes,
+                "condition": condition,
+            }
+        )
+
+    return dependencies
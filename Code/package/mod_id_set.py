@@ -0,0 +1,62 @@
+import threading
+from typing import Dict, Iterable, Iterator, List
+
+
+# Set of mod ids stored as an int bitmask. Every id ever seen gets a dense bit
+# position from a process-wide intern table, so membership is a bit test and
+# adding or removing one mod does not rebuild anything.
+class ModIdSet:
+    __slots__ = ("mask",)
+
+    _positions: Dict[str, int] = {}
+    _ids: List[str] = []
+    _lock = threading.Lock()
+
+    def __init__(self, mod_ids: Iterable[str] = ()):
+        self.mask = 0
+        for mod_id in mod_ids:
+            self.mask |= ModIdSet.bit(mod_id)
+
+    @staticmethod
+    def intern(mod_id: str) -> int:
+        position = ModIdSet._positions.get(mod_id)
+        if position is None:
+            with ModIdSet._lock:
+                position = ModIdSet._positions.setdefault(mod_id, len(ModIdSet._ids))
+                if position == len(ModIdSet._ids):
+                    ModIdSet._ids.append(mod_id)
+
+        return position
+
+    @staticmethod
+    def bit(mod_id: str) -> int:
+        return 1 << ModIdSet.intern(mod_id)
+
+    def add(self, mod_id: str) -> None:
+        self.mask |= ModIdSet.bit(mod_id)
+
+    def discard(self, mod_id: str) -> None:
+        self.mask &= ~ModIdSet.bit(mod_id)
+
+    def clear(self) -> None:
+        self.mask = 0
+
+    def has_bit(self, bit: int) -> bool:
+        return self.mask & bit != 0
+
+    def __contains__(self, mod_id: object) -> bool:
+        position = ModIdSet._positions.get(mod_id)  # type: ignore
+        return position is not None and self.mask >> position & 1 == 1
+
+    def __len__(self) -> int:
+        return self.mask.bit_count()
+
+    def __iter__(self) -> Iterator[str]:
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            yield ModIdSet._ids[low.bit_length() - 1]
+            mask ^= low
+
+    def __repr__(self) -> str:
+        return f"ModIdSet({sorted(self)})"
@@ -0,0 +1,161 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from .dataclasses import ModUnit
+from .mod_id_set import ModIdSet
+
+# Removed slots are compacted away once there are more of them than live mods.
+_MIN_COMPACT = 32
+
+
+# Ordered set of mods keyed by id. Mods sit in append-only slots, removing one
+# leaves a hole, and a Fenwick tree over occupied slots turns a slot into a
+# position in O(log n). Lookup, membership and swap are O(1). `ids` mirrors the
+# contents as a ModIdSet and is updated in place.
+class ModOrder:
+    def __init__(self, mods: Iterable[ModUnit] = ()):
+        self._slots: List[Optional[ModUnit]] = []
+        self._slot_of: Dict[str, int] = {}
+        self._tree: List[int] = [0]
+        self.ids = ModIdSet()
+        self.replace(mods)
+
+    def replace(self, mods: Iterable[ModUnit]) -> None:
+        # The first mod with a given id wins, like the old first-match lookups.
+        slots: List[Optional[ModUnit]] = []
+        slot_of: Dict[str, int] = {}
+        for mod in mods:
+            if mod.id not in slot_of:
+                slot_of[mod.id] = len(slots)
+                slots.append(mod)
+
+        tree = [0] * (len(slots) + 1)
+        for i in range(1, len(slots) + 1):
+            tree[i] += 1
+            parent = i + (i & -i)
+            if parent <= len(slots):
+                tree[parent] += tree[i]
+
+        self._slots = slots
+        self._slot_of = slot_of
+        self._tree = tree
+        self.ids.mask = ModIdSet(slot_of).mask
+
+    def _prefix(self, i: int) -> int:
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+
+        return total
+
+    def _update(self, i: int, delta: int) -> None:
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _find(self, position: int) -> int:
+        # Slot holding the mod at a 0-based position.
+        slot = 0
+        remaining = position + 1
+        step = 1 << (len(self._tree) - 1).bit_length() - 1
+        while step:
+            nxt = slot + step
+            if nxt < len(self._tree) and self._tree[nxt] < remaining:
+                slot = nxt
+                remaining -= self._tree[nxt]
+
+            step >>= 1
+
+        return slot
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __iter__(self) -> Iterator[ModUnit]:
+        for mod in self._slots:
+            if mod is not None:
+                yield mod
+
+    def __contains__(self, item: Union[ModUnit, str]) -> bool:
+        if isinstance(item, ModUnit):
+            slot = self._slot_of.get(item.id)
+            return slot is not None and self._slots[slot] is item
+
+        return item in self._slot_of
+
+    def __getitem__(self, position: int) -> ModUnit:
+        size = len(self)
+        if position < 0:
+            position += size
+
+        if not 0 <= position < size:
+            raise IndexError("ModOrder index out of range")
+
+        return self._slots[self._find(position)]  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"ModOrder({[mod.id for mod in self]})"
+
+    def get(self, mod_id: str) -> Optional[ModUnit]:
+        slot = self._slot_of.get(mod_id)
+        return None if slot is None else self._slots[slot]
+
+    def index(self, item: Union[ModUnit, str]) -> int:
+        mod_id = item.id if isinstance(item, ModUnit) else item
+        slot = self._slot_of.get(mod_id)
+        if slot is None:
+            raise ValueError(f"{mod_id} is not in ModOrder")
+
+        return self._prefix(slot + 1) - 1
+
+    def append(self, mod: ModUnit) -> bool:
+        if mod.id in self._slot_of:
+            return False
+
+        self._slots.append(mod)
+        self._slot_of[mod.id] = len(self._slots) - 1
+        self.ids.add(mod.id)
+
+        # A new Fenwick node covers (i - lowbit(i), i], itself included.
+        i = len(self._slots)
+        self._tree.append(1 + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        return True
+
+    def remove(self, item: Union[ModUnit, str]) -> None:
+        mod_id = item.id if isinstance(item, ModUnit) else item
+        slot = self._slot_of.pop(mod_id, None)
+        if slot is None:
+            raise ValueError(f"{mod_id} is not in ModOrder")
+
+        self._slots[slot] = None
+        self._update(slot + 1, -1)
+        self.ids.discard(mod_id)
+
+        holes = len(self._slots) - len(self._slot_of)
+        if holes > _MIN_COMPACT and holes > len(self._slot_of):
+            self.replace(list(self))
+
+    def move_to_end(self, mod_id: str) -> bool:
+        mod = self.get(mod_id)
+        if mod is None:
+            return False
+
+        self.remove(mod_id)
+        self.append(mod)
+        return True
+
+    def swap(self, mod_id1: str, mod_id2: str) -> bool:
+        slot1 = self._slot_of.get(mod_id1)
+        slot2 = self._slot_of.get(mod_id2)
+        if slot1 is None or slot2 is None:
+            return False
+
+        self._slots[slot1], self._slots[slot2] = self._slots[slot2], self._slots[slot1]
+        self._slot_of[mod_id1], self._slot_of[mod_id2] = slot2, slot1
+        return True
+
+    def sort(self, key: Callable[[ModUnit], object]) -> None:
+        self.replace(sorted(self, key=key))  # type: ignore
+
+    def clear(self) -> None:
+        self.replace(())
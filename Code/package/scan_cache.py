@@ -0,0 +1,229 @@
+import json
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from Code.app_vars import AppConfig
+
+logger = logging.getLogger(__name__)
+
+# (size, mtime_ns)
+Fingerprint = Tuple[int, int]
+
+# Bump when the stored data changes shape or the ID rules change meaning.
+_CACHE_FORMAT = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    add_id TEXT NOT NULL,
+    override_id TEXT NOT NULL,
+    has_toggle_content INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mods (
+    path TEXT PRIMARY KEY,
+    sources TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+
+@dataclass
+class FileScan:
+    add_id: Set[str]
+    override_id: Set[str]
+    has_toggle_content: bool
+
+    @staticmethod
+    def create_empty() -> "FileScan":
+        return FileScan(set(), set(), False)
+
+
+class ScanCache:
+    _connection: Optional[sqlite3.Connection] = None
+    _disabled: bool = False
+    _lock = threading.Lock()
+
+    _pending_files: List[Tuple[str, int, int, str, str, int]] = []
+    _pending_mods: List[Tuple[str, str, str]] = []
+
+    @staticmethod
+    def fingerprint(path: Path) -> Optional[Fingerprint]:
+        try:
+            stat = path.stat()
+
+        except OSError:
+            return None
+
+        return stat.st_size, stat.st_mtime_ns
+
+    @classmethod
+    def _get_connection(cls) -> Optional[sqlite3.Connection]:
+        if cls._connection is not None or cls._disabled:
+            return cls._connection
+
+        user_data_path = AppConfig.get_user_data_path()
+        if user_data_path == Path():
+            cls._disabled = True
+            return None
+
+        version = f"{AppConfig.version}:{_CACHE_FORMAT}"
+        try:
+            connection = sqlite3.connect(
+                user_data_path / "scan_cache.sqlite3", check_same_thread=False
+            )
+            connection.executescript(_SCHEMA)
+            row = connection.execute(
+                "SELECT value FROM info WHERE key = 'version'"
+            ).fetchone()
+            if row is None or row[0] != version:
+                connection.execute("DELETE FROM files")
+                connection.execute("DELETE FROM mods")
+                connection.execute(
+                    "INSERT OR REPLACE INTO info (key, value) VALUES ('version', ?)",
+                    (version,),
+                )
+                connection.commit()
+
+        except sqlite3.Error as err:
+            logger.error(f"Unable to open scan cache, caching disabled\n|Error: {err}")
+            cls._disabled = True
+            return None
+
+        cls._connection = connection
+        return connection
+
+    @classmethod
+    def get_file(
+        cls, path: Path, fingerprint: Optional[Fingerprint]
+    ) -> Optional[FileScan]:
+        if fingerprint is None:
+            return None
+
+        with cls._lock:
+            connection = cls._get_connection()
+            if connection is None:
+                return None
+
+            row = connection.execute(
+                "SELECT size, mtime_ns, add_id, override_id, has_toggle_content "
+                "FROM files WHERE path = ?",
+                (str(path),),
+            ).fetchone()
+
+        if row is None or (row[0], row[1]) != fingerprint:
+            return None
+
+        return FileScan(set(json.loads(row[2])), set(json.loads(row[3])), bool(row[4]))
+
+    @classmethod
+    def put_file(
+        cls, path: Path, fingerprint: Optional[Fingerprint], scan: FileScan
+    ) -> None:
+        if fingerprint is None:
+            return
+
+        with cls._lock:
+            cls._pending_files.append(
+                (
+                    str(path),
+                    fingerprint[0],
+                    fingerprint[1],
+                    json.dumps(sorted(scan.add_id)),
+                    json.dumps(sorted(scan.override_id)),
+                    int(scan.has_toggle_content),
+                )
+            )
+
+    @classmethod
+    def get_mod(cls, path: Path) -> Optional[Dict[str, Any]]:
+        with cls._lock:
+            connection = cls._get_connection()
+            if connection is None:
+                return None
+
+            row = connection.execute(
+                "SELECT sources, data FROM mods WHERE path = ?", (str(path),)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        # Every file the record was built from must be unchanged, a None
+        # fingerprint means the file must still not exist.
+        for source, fingerprint in json.loads(row[0]).items():
+            current = cls.fingerprint(Path(source))
+            if fingerprint is None:
+                if current is not None:
+                    return None
+
+            elif current != tuple(fingerprint):
+                return None
+
+        return json.loads(row[1])
+
+    @classmethod
+    def put_mod(cls, path: Path, sources: List[Path], data: Dict[str, Any]) -> None:
+        fingerprints = {str(source): cls.fingerprint(source) for source in sources}
+        with cls._lock:
+            cls._pending_mods.append(
+                (str(path), json.dumps(fingerprints), json.dumps(data))
+            )
+
+    @classmethod
+    def flush(cls) -> None:
+        with cls._lock:
+            if not (cls._pending_files or cls._pending_mods):
+                return
+
+            connection = cls._get_connection()
+            if connection is None:
+                cls._pending_files.clear()
+                cls._pending_mods.clear()
+                return
+
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO files "
+                        "(path, size, mtime_ns, add_id, override_id, has_toggle_content) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        cls._pending_files,
+                    )
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO mods (path, sources, data) "
+                        "VALUES (?, ?, ?)",
+                        cls._pending_mods,
+                    )
+
+            except sqlite3.Error as err:
+                logger.error(f"Unable to write scan cache\n|Error: {err}")
+
+            finally:
+                cls._pending_files.clear()
+                cls._pending_mods.clear()
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._pending_files.clear()
+            cls._pending_mods.clear()
+
+            connection = cls._get_connection()
+            if connection is None:
+                return
+
+            with connection:
+                connection.execute("DELETE FROM files")
+                connection.execute("DELETE FROM mods")
+
+        logger.info("Mod scan cache cleared")
@@ -1,7 +1,9 @@
 import logging
 import re
+import sys
 from pathlib import Path
-from typing import Dict, Generator, List, Optional, Tuple, Union
+from types import MappingProxyType
+from typing import Dict, Generator, Iterator, List, Mapping, Optional, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
@@ -29,13 +31,153 @@ class XMLParserException(Exception):
         )
 
 
+TOKEN_START = "start"
+TOKEN_END = "end"
+TOKEN_COMMENT = "comment"
+TOKEN_TEXT = "text"
+
+# (kind, value, attributes, self_closing, start, end)
+# value is the tag name for start/end tokens and the stripped text otherwise.
+XMLToken = Tuple[str, str, Optional[Mapping[str, str]], bool, int, int]
+# (kind, value, attributes) - kinds are the same as for tokens, self-closing
+# tags are reported as a start event immediately followed by an end event.
+XMLEvent = Tuple[str, str, Optional[Mapping[str, str]]]
+
+# Leading whitespace is consumed outside of the groups, so whitespace-only text
+# never becomes a token and text tokens come out already stripped.
+# Groups: 1 comment, 2 closing tag, 3 opening tag, 4 text, 5 malformed "<".
+_TOKEN_REGEX = re.compile(
+    r"\s*(?:"
+    r"<!--(.*?)-->"
+    r"|<\?.*?\?>"
+    r"|</([^>]*)>"
+    r"|<(?!!--|\?)([^>]*)>"
+    r"|([^<]*[^<\s])"
+    r"|(<)"
+    r")",
+    re.DOTALL,
+)
+_ATTR_REGEX = re.compile(r'(\w[\w-]*)\s*=\s*(".*?"|\'.*?\'|\S+)')
+
+# Shared by every node without attributes/children, replaced with a real
+# dict/list the first time the node is modified or handed out.
+_NO_ATTRIBUTES: Mapping[str, str] = MappingProxyType({})
+_NO_CHILDREN: Tuple = ()
+
+
+def _line_at(content: str, position: int) -> int:
+    return content.count("\n", 0, position) + 1
+
+
+def _terminator(content: str, position: int) -> str:
+    # What ends the construct iter_tokens() stopped at.
+    if content.startswith("<!--", position):
+        return "-->"
+
+    if content.startswith("<?", position):
+        return "?>"
+
+    return ">"
+
+
+def _keep_tail(content: str, terminator: str) -> str:
+    # Enough of the end to spot a terminator split between two chunks.
+    return content[len(content) - len(terminator) + 1 :]
+
+
+def _parse_attributes(attr_str: str) -> Mapping[str, str]:
+    intern = sys.intern
+    attributes = {
+        intern(key): value[1:-1] if value[0] in "\"'" else value
+        for key, value in _ATTR_REGEX.findall(attr_str)
+    }
+    return attributes or _NO_ATTRIBUTES
+
+
+def iter_tokens(content: str) -> Iterator[XMLToken]:
+    # Tag nesting is not validated here, that is left to the consumer.
+    for match in _TOKEN_REGEX.finditer(content):
+        group = match.lastindex
+
+        if group == 3:
+            inner = match.group(3)
+            self_closing = inner.endswith("/")
+            inner = inner.strip()
+            if self_closing:
+                inner = inner[:-1].strip()
+
+            parts = inner.split(None, 1)
+            if len(parts) == 2:
+                attributes = _parse_attributes(parts[1])
+
+            else:
+                attributes = _NO_ATTRIBUTES
+
+            yield (
+                TOKEN_START,
+                sys.intern(parts[0]) if parts else "",
+                attributes,
+                self_closing,
+                match.start(3) - 1,
+                match.end(),
+            )
+
+        elif group == 4:
+            yield (TOKEN_TEXT, match.group(4), None, False, match.start(4), match.end())
+
+        elif group == 2:
+            yield (
+                TOKEN_END,
+                match.group(2).strip(),
+                None,
+                False,
+                match.start(2) - 2,
+                match.end(),
+            )
+
+        elif group == 1:
+            yield (
+                TOKEN_COMMENT,
+                match.group(1).strip(),
+                None,
+                False,
+                match.start(1) - 4,
+                match.end(),
+            )
+
+        elif group == 5:
+            position = match.start(5)
+            if content.startswith("<!--", position):
+                message = "Unclosed comment"
+
+            elif content.startswith("<?", position):
+                message = "Invalid processing instruction"
+
+            elif content.startswith("</", position):
+                message = "Malformed closing tag"
+
+            else:
+                message = "Malformed tag"
+
+            raise XMLParserException(
+                message,
+                position=position,
+                line=_line_at(content, position),
+                content=content,
+            )
+
+
 class XMLBaseStruct:
+    __slots__ = ("parent", "index")
+
     def __init__(self) -> None:
         self.parent: Optional[XMLElement] = None
         self.index: Optional[int] = None
 
 
 class XMLComment(XMLBaseStruct):
+    __slots__ = ("content",)
+
     def __init__(self, content: str) -> None:
         super().__init__()
         self.content = content
@@ -61,29 +203,67 @@ class XMLComment(XMLBaseStruct):
 
 
 class XMLElement(XMLBaseStruct):
-    def __init__(self, tag: str, attributes: Optional[Dict[str, str]] = None):
-        super().__init__()
+    __slots__ = ("tag", "_attributes", "_childrens", "content")
+
+    def __init__(
+        self, tag: str, attributes: Optional[Mapping[str, str]] = None
+    ) -> None:
+        self.parent: Optional[XMLElement] = None
+        self.index: Optional[int] = None
         self.tag = tag
-        self.attributes: Dict[str, str] = attributes if attributes is not None else {}
-        self.childrens: List[Union["XMLElement", XMLComment]] = []
+        self._attributes = attributes if attributes is not None else _NO_ATTRIBUTES
+        self._childrens = _NO_CHILDREN
         self.content: str = ""
 
+    @property
+    def attributes(self) -> Dict[str, str]:
+        attributes = self._attributes
+        if not isinstance(attributes, dict):
+            attributes = self._attributes = dict(attributes)
+
+        return attributes
+
+    @attributes.setter
+    def attributes(self, value: Dict[str, str]) -> None:
+        self._attributes = value
+
+    @property
+    def attributes_view(self) -> Mapping[str, str]:
+        """Read-only attributes, without copying shared ones into a dict."""
+        return self._attributes
+
+    @property
+    def childrens(self) -> List[Union["XMLElement", XMLComment]]:
+        childrens = self._childrens
+        if childrens is _NO_CHILDREN:
+            childrens = self._childrens = []
+
+        return childrens
+
+    @childrens.setter
+    def childrens(self, value: List[Union["XMLElement", XMLComment]]) -> None:
+        self._childrens = value
+
     def add_child(self, child: Union["XMLElement", XMLComment]):
+        childrens = self._childrens
+        if childrens is _NO_CHILDREN:
+            childrens = self._childrens = []
+
         child.parent = self
-        child.index = len(self.childrens)
-        self.childrens.append(child)
+        child.index = len(childrens)
+        childrens.append(child)
 
     @property
     def count_of_childrens(self):
-        return len(self.childrens)
+        return len(self._childrens)
 
     def __getitem__(self, index):
-        return self.childrens[index]
+        return self._childrens[index]
 
     def __repr__(self):
         return (
-            f"XMLElement(name={repr(self.tag)}, attributes={self.attributes}, "
-            f"children={self.childrens}, content={repr(self.content)})"
+            f"XMLElement(name={repr(self.tag)}, attributes={dict(self._attributes)}, "
+            f"children={list(self._childrens)}, content={repr(self.content)})"
         )
 
     def replace(self, index: int, new_child: Union[XMLComment, "XMLElement"]) -> bool:
@@ -98,21 +278,21 @@ class XMLElement(XMLBaseStruct):
 
     def get_attribute_ignore_case(self, key: str, default=None):
         key_lower = key.lower()
-        for attr_key, attr_value in self.attributes.items():
+        for attr_key, attr_value in self._attributes.items():
             if attr_key.lower() == key_lower:
                 return attr_value
 
         return default
 
     def iter_comment_childrens(self) -> Generator[XMLComment, None, None]:
-        for elem in self.childrens:
+        for elem in self._childrens:
             if isinstance(elem, XMLElement):
                 continue
 
             yield elem
 
     def iter_non_comment_childrens(self) -> Generator["XMLElement", None, None]:
-        for elem in self.childrens:
+        for elem in self._childrens:
             if isinstance(elem, XMLComment):
                 continue
 
@@ -126,13 +306,13 @@ class XMLElement(XMLBaseStruct):
         inline_content: bool = False,
     ) -> str:
         indent_str = "" if single_line else indent_char * indent
-        attrs = " ".join(f'{key}="{value}"' for key, value in self.attributes.items())
+        attrs = " ".join(f'{key}="{value}"' for key, value in self._attributes.items())
         opening_tag = f"<{self.tag}{(' ' + attrs) if attrs else ''}>"
 
-        if not self.childrens and not self.content:
+        if not self._childrens and not self.content:
             return f"{indent_str}<{self.tag}{(' ' + attrs) if attrs else ''} />"
 
-        if not self.childrens and inline_content and self.content:
+        if not self._childrens and inline_content and self.content:
             return f"{indent_str}{opening_tag}{self.content}</{self.tag}>"
 
         result = f"{indent_str}{opening_tag}"
@@ -146,7 +326,7 @@ class XMLElement(XMLBaseStruct):
 
             result += content_str
 
-        for child in self.childrens:
+        for child in self._childrens:
             child_str = child.dump(indent + 4, indent_char, single_line, inline_content)
             if not single_line:
                 child_str += "\n"
@@ -171,129 +351,49 @@ class XMLElement(XMLBaseStruct):
         root = None
 
         content = content.strip()
-        i = 0
-        line = 1
-
-        while i < len(content):
-            if content[i] == "\n":
-                line += 1
-                i += 1
-                continue
-
-            if content.startswith("<?", i):
-                pi_end = content.find("?>", i + 2)
-                if pi_end == -1:
-                    raise XMLParserException(
-                        "Invalid processing instruction",
-                        line=line,
-                        position=i,
-                        content=content,
-                    )
-
-                i = pi_end + 2
-
-            elif content.startswith("<!--", i):
-                end_comment = content.find("-->", i + 4)
-                if end_comment == -1:
-                    raise XMLParserException(
-                        "Unclosed comment", position=i, line=line, content=content
-                    )
 
-                comment_text = content[i + 4 : end_comment].strip()
-                comment = XMLComment(comment_text)
+        for kind, value, attributes, self_closing, position, _ in iter_tokens(content):
+            if kind == TOKEN_TEXT:
                 if stack:
-                    stack[-1].add_child(comment)
+                    stack[-1].content += value
 
-                i = end_comment + 3
+            elif kind == TOKEN_START:
+                element = XMLElement(value, attributes)
+                if not self_closing:
+                    stack.append(element)
 
-            elif content[i] == "<":
-                if content.startswith("</", i):
-                    tag_start = i + 2
-                    tag_end = content.find(">", tag_start)
-                    if tag_end == -1:
-                        raise XMLParserException(
-                            "Malformed closing tag",
-                            position=i,
-                            line=line,
-                            content=content,
-                        )
-
-                    tag_name = content[tag_start:tag_end].strip()
-                    if not stack or stack[-1].tag != tag_name:
-                        raise XMLParserException(
-                            "Unexpected closing tag",
-                            tag=tag_name,
-                            position=i,
-                            line=line,
-                            content=content,
-                        )
-
-                    closed_element = stack.pop()
-                    if not stack:
-                        root = closed_element
-
-                    else:
-                        stack[-1].add_child(closed_element)
-
-                    i = tag_end + 1
+                elif stack:
+                    stack[-1].add_child(element)
 
                 else:
-                    tag_start = i + 1
-                    tag_end = content.find(">", tag_start)
-                    if tag_end == -1:
-                        raise XMLParserException(
-                            "Malformed tag", position=i, line=line, content=content
-                        )
-
-                    is_self_closing = content[tag_end - 1] == "/"
-                    tag_content = content[tag_start:tag_end].strip()
-                    if is_self_closing:
-                        tag_content = tag_content[:-1].strip()
-
-                    parts = re.split(r"\s+", tag_content, maxsplit=1)
-                    tag_name = parts[0]
-                    attributes = {}
-                    if len(parts) > 1:
-                        attr_str = parts[1]
-                        attr_regex = re.compile(r'(\w[\w-]*)\s*=\s*(".*?"|\'.*?\'|\S+)')
-                        for match in attr_regex.finditer(attr_str):
-                            key, value = match.groups()
-                            if value[0] in "\"'":
-                                value = value[1:-1]
-
-                            attributes[key] = value
-
-                    element = XMLElement(tag_name, attributes)
-                    if is_self_closing:
-                        if stack:
-                            stack[-1].add_child(element)
+                    root = element
 
-                        else:
-                            root = element
-
-                    else:
-                        stack.append(element)
-
-                    i = tag_end + 1
+            elif kind == TOKEN_END:
+                if not stack or stack[-1].tag != value:
+                    raise XMLParserException(
+                        "Unexpected closing tag",
+                        tag=value,
+                        position=position,
+                        line=_line_at(content, position),
+                        content=content,
+                    )
 
-            else:
-                text_start = i
-                next_tag_pos = content.find("<", i)
-                if next_tag_pos == -1:
-                    next_tag_pos = len(content)
+                closed_element = stack.pop()
+                if not stack:
+                    root = closed_element
 
-                text_content = content[text_start:next_tag_pos]
-                if stack and text_content.strip():
-                    stack[-1].content += text_content.strip()
+                else:
+                    stack[-1].add_child(closed_element)
 
-                i = next_tag_pos
+            elif stack:
+                stack[-1].add_child(XMLComment(value))
 
         if stack:
             raise XMLParserException(
                 "Unclosed tags remain",
                 tag=stack[-1].tag,
-                position=i,
-                line=line,
+                position=len(content),
+                line=_line_at(content, len(content)),
                 content=content,
             )
 
@@ -307,12 +407,12 @@ class XMLElement(XMLBaseStruct):
             element_name_lower = element.tag.lower()
             pattern_lower = pattern.lower()
             return element_name_lower == pattern_lower or pattern_lower in (
-                value.lower() for value in element.attributes.values()
+                value.lower() for value in element._attributes.values()
             )
 
         compiled_pattern = re.compile(pattern, re.IGNORECASE)
         return compiled_pattern.search(element.tag) is not None or any(
-            compiled_pattern.search(value) for value in element.attributes.values()
+            compiled_pattern.search(value) for value in element._attributes.values()
         )
 
     @staticmethod
@@ -329,7 +429,7 @@ class XMLElement(XMLBaseStruct):
             if XMLElement._match_name_and_attributes(element, pattern, exact_match):
                 yield element
 
-            for child in element.childrens:
+            for child in element._childrens:
                 if isinstance(child, XMLElement):
                     yield from match_element(child)
 
@@ -344,7 +444,7 @@ class XMLElement(XMLBaseStruct):
         self, pattern: str, exact_match: bool = False
     ) -> Generator["XMLComment", None, None]:
         def match_element(element: "XMLElement"):
-            for child in element.childrens:
+            for child in element._childrens:
                 if isinstance(child, XMLElement):
                     yield from match_element(child)
 
@@ -362,7 +462,7 @@ class XMLElement(XMLBaseStruct):
             if XMLElement._match_name_and_attributes(element, pattern, exact_match):
                 yield element
 
-            for child in element.childrens:
+            for child in element._childrens:
                 if isinstance(child, XMLElement):
                     yield from match_element(child)
 
@@ -373,7 +473,7 @@ class XMLElement(XMLBaseStruct):
     ) -> Generator["XMLElement", None, None]:
         def match_element(element: "XMLElement"):
             previous_was_comment = False
-            for child in element.childrens:
+            for child in element._childrens:
                 if isinstance(child, XMLComment) and XMLElement._match_comment(
                     child.content, pattern, exact_match
                 ):
@@ -403,7 +503,7 @@ class XMLElement(XMLBaseStruct):
         elements_between = []
         collecting = False
 
-        for element in self.childrens:
+        for element in self._childrens:
             if (
                 isinstance(element, XMLComment)
                 and not collecting
@@ -446,6 +546,131 @@ class XMLBuilder:
 
         return XMLElement.build_element(content)
 
+    @staticmethod
+    def load_root(
+        path: Union[Path, str, None], encoding: str = "utf-8-sig"
+    ) -> Union[XMLElement, None]:
+        for _, tag, attributes in XMLBuilder.iter_events(
+            path, encoding, root_only=True
+        ):
+            return XMLElement(tag, attributes)
+
+        return None
+
+    @staticmethod
+    def iter_events(
+        path: Union[Path, str, None],
+        encoding: str = "utf-8-sig",
+        root_only: bool = False,
+        chunk_size: int = 65536,
+    ) -> Generator[XMLEvent, None, None]:
+        if path is None:
+            return
+
+        path = Path(path)
+        if not path.exists():
+            return
+
+        if root_only:
+            chunk_size = min(chunk_size, 4096)
+
+        stack: List[str] = []
+        buffer = ""
+        eof = False
+        # Characters and lines of the file before buffer[0], errors report
+        # positions in the file, not in the buffer.
+        offset = 0
+        lines = 0
+        # An unfinished construct at the end of the buffer waits for its
+        # terminator, the chunks read meanwhile are only joined once it shows
+        # up so the construct is tokenized once, not once per chunk.
+        terminator = ""
+        waiting: List[str] = []
+        tail = ""
+
+        with open(path, "r", encoding=encoding) as file:
+            while not eof:
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                if terminator and not eof and terminator not in tail + chunk:
+                    waiting.append(chunk)
+                    tail = _keep_tail(tail + chunk, terminator)
+                    continue
+
+                buffer = "".join([buffer, *waiting, chunk])
+                waiting = []
+                terminator = ""
+
+                tokens: List[XMLToken] = []
+                consumed = 0
+                try:
+                    for token in iter_tokens(buffer):
+                        # Text running into the end of the buffer may continue
+                        # in the next chunk.
+                        if (
+                            not eof
+                            and token[0] == TOKEN_TEXT
+                            and buffer.find("<", token[5]) == -1
+                        ):
+                            terminator = "<"
+                            break
+
+                        tokens.append(token)
+                        consumed = token[5]
+
+                except XMLParserException as err:
+                    # Every tokenizer error is an unterminated construct, which
+                    # only means something once there is nothing left to read.
+                    if eof:
+                        raise XMLParserException(
+                            err.args[0],
+                            position=offset + (err.position or 0),
+                            line=lines + (err.line or 1),
+                            content=str(path),
+                        ) from None
+
+                    terminator = _terminator(buffer, err.position or 0)
+
+                scanned, scanned_offset, scanned_lines = buffer, offset, lines
+                offset += consumed
+                lines += buffer.count("\n", 0, consumed)
+                buffer = buffer[consumed:]
+                if terminator:
+                    tail = _keep_tail(buffer, terminator)
+
+                for kind, value, attributes, self_closing, position, _ in tokens:
+                    if kind == TOKEN_START:
+                        yield (TOKEN_START, value, attributes)
+                        if root_only:
+                            return
+
+                        if self_closing:
+                            yield (TOKEN_END, value, None)
+
+                        else:
+                            stack.append(value)
+
+                    elif kind == TOKEN_END:
+                        if not stack or stack[-1] != value:
+                            raise XMLParserException(
+                                "Unexpected closing tag",
+                                tag=value,
+                                position=scanned_offset + position,
+                                line=scanned_lines + _line_at(scanned, position),
+                                content=str(path),
+                            )
+
+                        stack.pop()
+                        yield (TOKEN_END, value, None)
+
+                    elif stack:
+                        yield (kind, value, None)
+
+        if stack:
+            raise XMLParserException(
+                "Unclosed tags remain", tag=stack[-1], content=str(path)
+            )
+
     @staticmethod
     def save(
         element: XMLElement, path: Union[Path, str], encoding: str = "utf-8"
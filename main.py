@@ -1,11 +1,12 @@
 import argparse
 import logging
+import multiprocessing
 import os
 import platform
 import re
 import signal
 import sys
-from typing import Any, Type
+from typing import Any, List, Type
 
 from colorama import Fore, Style, init
 
@@ -15,6 +16,7 @@ from Code.app_vars import AppConfig
 from Code.game import Game
 from Code.handlers import ModManager
 from Code.loc import Localization as loc
+from Code.package import IdIndex, InternalLibrary, ScanCache, ScanPool
 
 
 def signal_handler(signum, frame):
@@ -82,12 +84,21 @@ def check_path_for_non_ascii():
 
 
 def args_no_gui(
+    debug: bool,
     start_game: bool,
     auto_game_path: bool,
     auto_lua: bool,
     skip_intro: bool,
     process_btm: bool,
+    rescan: bool,
+    jobs: int,
 ):
+    # The scan cache lives in the user data dir, which AppConfig sets up.
+    initialize_components(debug, AppConfig, loc)
+    ScanPool.configure(jobs)
+    if rescan:
+        ScanCache.clear()
+
     if auto_game_path:
         game_path = AppConfig.get_game_path()
         if game_path is None:
@@ -112,7 +123,27 @@ def args_no_gui(
         Game.run_game(skip_intro=skip_intro)
 
 
-def main(debug: bool):
+def who_has(debug: bool, jobs: int, identifiers: List[str]):
+    initialize_components(debug, AppConfig, loc)
+    ScanPool.configure(jobs)
+    ModManager.load_mods()
+
+    for identifier in identifiers:
+        entries = IdIndex.get(identifier)
+        if not entries:
+            logging.info(f"No mod adds or overrides '{identifier}'")
+            continue
+
+        winner = IdIndex.winner(identifier, ModManager.active_mods)
+        for mod, kind in entries:
+            state = "active" if mod in ModManager.active_mods else "inactive"
+            mark = " (used)" if mod is winner else ""
+            logging.info(
+                f"{identifier}: {kind} by '{mod.name}' [{mod.id}], {state}{mark}"
+            )
+
+
+def main(debug: bool, rescan: bool, jobs: int):
     logging.debug("Starting program...")
     try:
         signal.signal(signal.SIGTERM, signal_handler)
@@ -121,7 +152,12 @@ def main(debug: bool):
         logging.warning(f"Failed to set up signal handlers: {e}")
 
     try:
-        initialize_components(debug, AppConfig, loc, ModManager, AppInitializer)
+        initialize_components(debug, AppConfig, loc)
+        ScanPool.configure(jobs)
+        if rescan:
+            ScanCache.clear()
+
+        initialize_components(debug, ModManager, AppInitializer)
         logging.debug("Initialization complete.")
         App.run()
     except Exception as e:
@@ -133,6 +169,9 @@ def main(debug: bool):
 
 
 if __name__ == "__main__":
+    # ScanPool workers are spawned, in the frozen build each of them starts
+    # this script again and has to stop here instead of running the app.
+    multiprocessing.freeze_support()
     try:
         init(autoreset=True)
         check_path_for_non_ascii()
@@ -153,6 +192,29 @@ if __name__ == "__main__":
             "--si", action="store_true", help="Skip intro (requires --sg)"
         )
         parser.add_argument("--pbmt", action="store_true", help="Process modifications")
+        parser.add_argument(
+            "--rescan",
+            action="store_true",
+            help="Drop the mod scan cache and parse all mods again",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=0,
+            metavar="N",
+            help="Parse mod files in N worker processes (0 keeps the thread pool)",
+        )
+        parser.add_argument(
+            "--pack-library",
+            action="store_true",
+            help="Compile Data/InternalLibrary into a single pack file and exit",
+        )
+        parser.add_argument(
+            "--who-has",
+            nargs="+",
+            metavar="ID",
+            help="List the mods that add or override the given ids (e.g. item.wrench) and exit",
+        )
         args = parser.parse_args()
 
         configure_logging(args.debug)
@@ -168,11 +230,27 @@ if __name__ == "__main__":
             )
         del platform_name
 
-        if args.ngui:
-            args_no_gui(args.sg, args.apath, args.alua, args.si, args.pbmt)
+        if args.pack_library:
+            entries = InternalLibrary.build_pack()
+            logging.info(f"InternalLibrary pack built: {entries} entries")
+
+        elif args.who_has:
+            who_has(args.debug, args.jobs, args.who_has)
+
+        elif args.ngui:
+            args_no_gui(
+                args.debug,
+                args.sg,
+                args.apath,
+                args.alua,
+                args.si,
+                args.pbmt,
+                args.rescan,
+                args.jobs,
+            )
 
         else:
-            main(args.debug)
+            main(args.debug, args.rescan, args.jobs)
 
     except Exception:
         logging.critical("Unhandled exception occurred.", exc_info=True)
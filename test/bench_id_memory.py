@@ -0,0 +1,84 @@
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Set
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Code.package import IdSet, IdTable  # noqa: E402
+
+PREFIXES = ["item", "character", "afflictions", "talent", "sound", "npcset"]
+
+
+def build_corpus(
+    mods: int, ids_per_mod: int, shared: float, seed: int
+) -> List[List[Set[str]]]:
+    # A `shared` fraction of every mod's ids comes from a common pool (vanilla
+    # content that gets overridden, libraries many mods ship), the rest is
+    # unique to the mod.
+    rng = random.Random(seed)
+    pool = [
+        f"{rng.choice(PREFIXES)}.common_{'x' * rng.randint(4, 20)}{index}"
+        for index in range(max(ids_per_mod * 4, 1))
+    ]
+    corpus = []
+    for index in range(mods):
+        count = rng.randint(ids_per_mod // 4, ids_per_mod * 2)
+        common = int(count * shared)
+        add_id = {
+            f"{rng.choice(PREFIXES)}.mod{index}_{'x' * rng.randint(4, 20)}{i}"
+            for i in range(count - common)
+        }
+        override_id = set(rng.sample(pool, min(common, len(pool))))
+        corpus.append([add_id, override_id])
+
+    return corpus
+
+
+def measure(label: str, build: Callable, corpus: List[List[Set[str]]]) -> list:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    sets = build(corpus)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {current / (1024 * 1024):8.2f} MB  built in {elapsed:.2f}s")
+    return sets
+
+
+def as_str_sets(corpus: List[List[Set[str]]]) -> list:
+    return [[set("".join(list(name)) for name in ids) for ids in mod] for mod in corpus]
+
+
+def as_id_sets(corpus: List[List[Set[str]]]) -> list:
+    return [
+        [IdSet("".join(list(name)) for name in ids) for ids in mod] for mod in corpus
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-mod id set memory benchmark")
+    parser.add_argument("--mods", type=int, default=1000)
+    parser.add_argument("--ids", type=int, default=2000, help="average ids per mod")
+    parser.add_argument(
+        "--shared", type=float, default=0.5, help="fraction of ids common to mods"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.mods, args.ids, args.shared, args.seed)
+    total = sum(len(ids) for mod in corpus for ids in mod)
+    print(f"Corpus: {args.mods} mods, {total} ids")
+
+    measure("set[str]", as_str_sets, corpus)
+    measure("IdSet", as_id_sets, corpus)
+    print(f"Intern table: {IdTable.size()} unique ids")
+
+
+if __name__ == "__main__":
+    main()
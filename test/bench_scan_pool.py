@@ -0,0 +1,129 @@
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Code.package import IdLoader, ModUnit, ScanPool  # noqa: E402
+
+ITEM_TEMPLATE = """  <Item identifier="{identifier}" category="Equipment" tags="smallitem,tool">
+    <Sprite texture="%ModDir%/items.png" sourcerect="0,0,64,64" depth="0.55" />
+    <Body width="40" height="20" density="20" />
+    <Holdable slots="Any,RightHand,LeftHand" handle1="0,0" aimpos="60,0">
+      <StatusEffect type="OnUse" target="This" Condition="-5.0" />
+    </Holdable>
+  </Item>
+"""
+
+OVERRIDE_TEMPLATE = """  <Override>
+{items}  </Override>
+"""
+
+
+def write_mod(root: Path, index: int, rng: random.Random) -> None:
+    mod_dir = root / f"mod_{index:04d}"
+    (mod_dir / "Items").mkdir(parents=True)
+    (mod_dir / "filelist.xml").write_text(
+        f'<contentpackage name="Synthetic {index}" steamworkshopid="{index}" '
+        f'modversion="1.0.0" gameversion="1.0.0.0">\n</contentpackage>\n',
+        encoding="utf-8",
+    )
+    (mod_dir / "metadata.xml").write_text(
+        "<metadata>\n  <meta><author>bench</author></meta>\n</metadata>\n",
+        encoding="utf-8",
+    )
+
+    # Most mods are small, a few are large content packs.
+    file_count = rng.choice([1, 1, 2, 3, 5, 8, 20])
+    for file_index in range(file_count):
+        items = "".join(
+            ITEM_TEMPLATE.format(identifier=f"mod{index}_item{file_index}_{item}")
+            for item in range(rng.randint(5, 150))
+        )
+        if rng.random() < 0.2:
+            items = OVERRIDE_TEMPLATE.format(items=items)
+
+        (mod_dir / "Items" / f"items_{file_index}.xml").write_text(
+            f"<Items>\n{items}</Items>\n", encoding="utf-8"
+        )
+
+
+def build_corpus(root: Path, mods: int, seed: int) -> List[Path]:
+    rng = random.Random(seed)
+    for index in range(mods):
+        write_mod(root, index, rng)
+
+    return sorted(root.iterdir())
+
+
+def load_all(paths: List[Path]) -> Dict[str, Tuple[frozenset, frozenset]]:
+    # Same shape as ModManager._build_inactive_mods.
+    with ThreadPoolExecutor() as executor:
+        mods = [mod for mod in executor.map(ModUnit.build, paths) if mod is not None]
+
+    IdLoader.ensure(mods)
+    return {mod.id: (frozenset(mod.add_id), frozenset(mod.override_id)) for mod in mods}
+
+
+def measure(paths: List[Path], jobs: int, rounds: int):
+    ScanPool.configure(jobs)
+    if jobs:
+        # Start the workers outside the timed region, like a warm app session.
+        load_all(paths[:1])
+
+    best = float("inf")
+    result = {}
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = load_all(paths)
+        best = min(best, time.perf_counter() - start)
+
+    ScanPool.configure(0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thread vs process mod scan benchmark")
+    parser.add_argument("--mods", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        nargs="+",
+        default=sorted({2, 4, os.cpu_count() or 1}),
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = build_corpus(Path(temp_dir), args.mods, args.seed)
+        xml_files = list(Path(temp_dir).rglob("*.xml"))
+        size_mb = sum(file.stat().st_size for file in xml_files) / (1024 * 1024)
+        print(
+            f"Corpus: {len(paths)} mods, {len(xml_files)} files, {size_mb:.2f} MB "
+            f"({os.cpu_count()} CPUs)"
+        )
+
+        thread_time, expected = measure(paths, 0, args.rounds)
+        print(f"threads:      {thread_time:.3f}s  {size_mb / thread_time:.2f} MB/s")
+
+        for jobs in args.jobs:
+            pool_time, result = measure(paths, jobs, args.rounds)
+            status = "ok" if result == expected else "MISMATCH"
+            print(
+                f"processes={jobs:<2} {pool_time:.3f}s  {size_mb / pool_time:.2f} MB/s  "
+                f"x{thread_time / pool_time:.2f}  {status}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from Code.xml_object import (  # noqa: E402
+    TOKEN_END,
+    TOKEN_START,
+    TOKEN_TEXT,
+    XMLElement,
+    XMLParserException,
+    iter_tokens,
+)
+
+DEFAULT_CORPUS = ROOT / "Data" / "InternalLibrary"
+
+
+# Nodes as they were before slots and the shared empty attributes/children:
+# a __dict__, an attribute dict and a child list on every node.
+class LegacyComment:
+    def __init__(self, content: str) -> None:
+        self.parent: Optional[LegacyElement] = None
+        self.index: Optional[int] = None
+        self.content = content
+
+
+class LegacyElement:
+    def __init__(self, tag: str, attributes: Optional[Dict[str, str]] = None):
+        self.parent: Optional[LegacyElement] = None
+        self.index: Optional[int] = None
+        self.tag = tag
+        self.attributes: Dict[str, str] = attributes if attributes is not None else {}
+        self.childrens: List[Union[LegacyElement, LegacyComment]] = []
+        self.content: str = ""
+
+    def add_child(self, child: Union["LegacyElement", LegacyComment]):
+        child.parent = self
+        child.index = len(self.childrens)
+        self.childrens.append(child)
+
+
+def legacy_build_element(content: str) -> Optional[LegacyElement]:
+    # Same tokenizer, so only the node layout differs. Attribute names stay
+    # interned, which if anything flatters the baseline.
+    stack: List[LegacyElement] = []
+    root = None
+
+    for kind, value, attributes, self_closing, _, _ in iter_tokens(content.strip()):
+        if kind == TOKEN_TEXT:
+            if stack:
+                stack[-1].content += value
+
+        elif kind == TOKEN_START:
+            element = LegacyElement(value, dict(attributes or {}))
+            if not self_closing:
+                stack.append(element)
+
+            elif stack:
+                stack[-1].add_child(element)
+
+            else:
+                root = element
+
+        elif kind == TOKEN_END:
+            if not stack or stack[-1].tag != value:
+                raise XMLParserException("Unexpected closing tag", tag=value)
+
+            closed_element = stack.pop()
+            if not stack:
+                root = closed_element
+
+            else:
+                stack[-1].add_child(closed_element)
+
+        elif stack:
+            stack[-1].add_child(LegacyComment(value))
+
+    return root
+
+
+def load_corpus(path: Path) -> List[str]:
+    files = [path] if path.is_file() else sorted(path.rglob("*.[Xx][Mm][Ll]"))
+    return [file.read_text(encoding="utf-8-sig") for file in files]
+
+
+def measure_peak(build: Callable, documents: List[str]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    trees = [build(document) for document in documents]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del trees
+    return peak
+
+
+def report(label: str, peak: int, size_mb: float) -> None:
+    print(
+        f"{label:<12} peak {peak / (1024 * 1024):7.2f} MB  "
+        f"{peak / 1024 / size_mb:9.1f} KB per MB of XML"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XML tree memory benchmark")
+    parser.add_argument("corpus", nargs="?", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument(
+        "--no-baseline", action="store_true", help="only measure the current tree"
+    )
+    args = parser.parse_args()
+
+    documents = load_corpus(args.corpus)
+    size_mb = sum(len(doc.encode("utf-8")) for doc in documents) / (1024 * 1024)
+    print(f"Corpus: {args.corpus} ({len(documents)} files, {size_mb:.2f} MB)")
+
+    baseline_peak = None
+    if not args.no_baseline:
+        baseline_peak = measure_peak(legacy_build_element, documents)
+        report("legacy", baseline_peak, size_mb)
+
+    peak = measure_peak(XMLElement.build_element, documents)
+    report("current", peak, size_mb)
+    if baseline_peak:
+        print(f"current/baseline peak: {peak / baseline_peak:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
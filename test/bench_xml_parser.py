@@ -0,0 +1,186 @@
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Code.xml_object import XMLComment, XMLElement, XMLParserException  # noqa: E402
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[1] / "Data" / "InternalLibrary"
+
+
+def legacy_build_element(content: str) -> Optional[XMLElement]:
+    # Character-walking parser as it was before the tokenizer rewrite.
+    stack: List[XMLElement] = []
+    root = None
+
+    content = content.strip()
+    i = 0
+    line = 1
+
+    while i < len(content):
+        if content[i] == "\n":
+            line += 1
+            i += 1
+            continue
+
+        if content.startswith("<?", i):
+            pi_end = content.find("?>", i + 2)
+            if pi_end == -1:
+                raise XMLParserException("Invalid processing instruction")
+
+            i = pi_end + 2
+
+        elif content.startswith("<!--", i):
+            end_comment = content.find("-->", i + 4)
+            if end_comment == -1:
+                raise XMLParserException("Unclosed comment")
+
+            comment = XMLComment(content[i + 4 : end_comment].strip())
+            if stack:
+                stack[-1].add_child(comment)
+
+            i = end_comment + 3
+
+        elif content[i] == "<":
+            if content.startswith("</", i):
+                tag_end = content.find(">", i + 2)
+                if tag_end == -1:
+                    raise XMLParserException("Malformed closing tag")
+
+                tag_name = content[i + 2 : tag_end].strip()
+                if not stack or stack[-1].tag != tag_name:
+                    raise XMLParserException("Unexpected closing tag", tag=tag_name)
+
+                closed_element = stack.pop()
+                if not stack:
+                    root = closed_element
+
+                else:
+                    stack[-1].add_child(closed_element)
+
+                i = tag_end + 1
+
+            else:
+                tag_end = content.find(">", i + 1)
+                if tag_end == -1:
+                    raise XMLParserException("Malformed tag")
+
+                is_self_closing = content[tag_end - 1] == "/"
+                tag_content = content[i + 1 : tag_end].strip()
+                if is_self_closing:
+                    tag_content = tag_content[:-1].strip()
+
+                parts = re.split(r"\s+", tag_content, maxsplit=1)
+                attributes = {}
+                if len(parts) > 1:
+                    attr_regex = re.compile(r'(\w[\w-]*)\s*=\s*(".*?"|\'.*?\'|\S+)')
+                    for match in attr_regex.finditer(parts[1]):
+                        key, value = match.groups()
+                        if value[0] in "\"'":
+                            value = value[1:-1]
+
+                        attributes[key] = value
+
+                element = XMLElement(parts[0], attributes)
+                if is_self_closing:
+                    if stack:
+                        stack[-1].add_child(element)
+
+                    else:
+                        root = element
+
+                else:
+                    stack.append(element)
+
+                i = tag_end + 1
+
+        else:
+            next_tag_pos = content.find("<", i)
+            if next_tag_pos == -1:
+                next_tag_pos = len(content)
+
+            text_content = content[i:next_tag_pos]
+            if stack and text_content.strip():
+                stack[-1].content += text_content.strip()
+
+            i = next_tag_pos
+
+    if stack:
+        raise XMLParserException("Unclosed tags remain", tag=stack[-1].tag)
+
+    return root
+
+
+def load_corpus(path: Path) -> List[str]:
+    return [
+        file.read_text(encoding="utf-8-sig")
+        for file in sorted(path.rglob("*.[Xx][Mm][Ll]"))
+    ]
+
+
+def measure(parser, documents: List[str], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for document in documents:
+            try:
+                parser(document)
+
+            except XMLParserException:
+                pass
+
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def check_equal(documents: List[str]) -> int:
+    mismatches = 0
+    for document in documents:
+        try:
+            old = legacy_build_element(document)
+
+        except XMLParserException:
+            old = None
+
+        try:
+            new = XMLElement.build_element(document)
+
+        except XMLParserException:
+            new = None
+
+        old_dump = old.dump() if old is not None else None
+        new_dump = new.dump() if new is not None else None
+        if old_dump != new_dump:
+            mismatches += 1
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XML parser throughput benchmark")
+    parser.add_argument("corpus", nargs="?", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    documents = load_corpus(args.corpus)
+    size_mb = sum(len(doc.encode("utf-8")) for doc in documents) / (1024 * 1024)
+    print(f"Corpus: {args.corpus} ({len(documents)} files, {size_mb:.2f} MB)")
+
+    mismatches = check_equal(documents)
+    print(f"Tree mismatches: {mismatches}")
+
+    legacy_time = measure(legacy_build_element, documents, args.rounds)
+    current_time = measure(XMLElement.build_element, documents, args.rounds)
+
+    print(f"legacy:    {legacy_time:.3f}s  {size_mb / legacy_time:.2f} MB/s")
+    print(f"tokenizer: {current_time:.3f}s  {size_mb / current_time:.2f} MB/s")
+    print(f"speedup:   x{legacy_time / current_time:.2f}")
+
+
+if __name__ == "__main__":
+    main()
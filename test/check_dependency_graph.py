@@ -0,0 +1,153 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Code.handlers.dependency_graph import DependencyGraph, SortResult  # noqa: E402
+from Code.package import Dependencie, IdSet, Metadata, ModOrder, ModUnit  # noqa: E402
+
+
+def make_mods(count: int, seed: int) -> List[ModUnit]:
+    rng = random.Random(seed)
+    mods = []
+    for index in range(count):
+        mod = ModUnit.create_empty()
+        mod.name = f"Mod {rng.randint(0, count // 2):04d}"
+        mod.steam_id = str(1000 + index)
+        mod.metadata = Metadata.create_empty()
+        add_id = {f"item{index}_{i}" for i in range(rng.randint(0, 5))}
+        if rng.random() < 0.1:
+            add_id.add(f"shared{rng.randint(0, 20)}")
+
+        override_id = set()
+        for _ in range(rng.choice([0, 0, 0, 1, 2])):
+            target = rng.randrange(count)
+            override_id.add(
+                rng.choice([f"item{target}_0", f"shared{rng.randint(0, 20)}"])
+            )
+
+        mod.add_id = IdSet(add_id)
+        mod.override_id = IdSet(override_id)
+
+        # Mostly backwards dependencies with the odd forward one, so cycles
+        # happen now and then.
+        for _ in range(rng.choice([0, 0, 1, 1, 2, 3])):
+            if index and rng.random() < 0.95:
+                target = rng.randrange(max(0, index - 30), index)
+            else:
+                target = rng.randrange(count)
+
+            condition = None
+            if rng.random() < 0.1:
+                condition = f"ifhas('{1000 + rng.randrange(count)}')"
+
+            mod.metadata.dependencies.append(
+                Dependencie(
+                    "",
+                    str(1000 + target),
+                    rng.choice(["patch", "requirement", "requirement", "conflict"]),
+                    {},
+                    condition,
+                )
+            )
+
+        mods.append(mod)
+
+    return mods
+
+
+def summary(result: SortResult):
+    return (
+        [mod.id for mod in result.order],
+        [(cycle.mod_ids, cycle.edges) for cycle in result.cycles],
+        sorted(result.blocked_ids),
+        sorted(result.conflicts),
+        sorted(result.missing),
+    )
+
+
+def check(mods: List[ModUnit], steps: int, seed: int) -> None:
+    rng = random.Random(seed)
+    active = ModOrder(rng.sample(mods, len(mods) // 2))
+    graph = DependencyGraph(active.index)
+    graph.rebuild(active)
+
+    for step in range(steps):
+        action = rng.random()
+        if action < 0.4:
+            mod = rng.choice(mods)
+            if mod.id in active:
+                active.remove(mod.id)
+                graph.remove_mod(mod.id)
+            else:
+                active.append(mod)
+                graph.add_mod(mod)
+
+        elif action < 0.7 and len(active) > 1:
+            first, second = rng.sample(range(len(active)), 2)
+            first_id, second_id = active[first].id, active[second].id
+            active.swap(first_id, second_id)
+            graph.order_changed((first_id, second_id))
+
+        elif action < 0.8 and len(active):
+            mod_id = active[rng.randrange(len(active))].id
+            active.move_to_end(mod_id)
+            graph.order_changed((mod_id,))
+
+        elif action < 0.9:
+            result = graph.sort()
+            if result.success:
+                active.replace(result.order)
+                graph.order_changed()
+
+        fresh = DependencyGraph(active.index)
+        fresh.rebuild(active)
+        if summary(graph.sort()) != summary(fresh.sort()):
+            raise AssertionError(f"Incremental graph diverged at step {step}")
+
+    print(f"{steps} random edits match a full rebuild")
+
+
+def bench(mods: List[ModUnit], toggles: int, seed: int) -> None:
+    rng = random.Random(seed)
+    active = ModOrder(mods)
+
+    start = time.perf_counter()
+    graph = DependencyGraph(active.index)
+    graph.rebuild(active)
+    graph.sort()
+    print(
+        f"Full build + sort of {len(active)} mods: {time.perf_counter() - start:.3f}s"
+    )
+
+    elapsed = 0.0
+    for _ in range(toggles):
+        mod = rng.choice(mods)
+        start = time.perf_counter()
+        if mod.id in active:
+            active.remove(mod.id)
+            graph.remove_mod(mod.id)
+        else:
+            active.append(mod)
+            graph.add_mod(mod)
+        graph.sort()
+        elapsed += time.perf_counter() - start
+
+    print(f"Toggle + sort: {elapsed / toggles * 1000:.2f}ms on average")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the incremental dependency graph against full rebuilds"
+    )
+    parser.add_argument("--mods", type=int, default=800)
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    check(make_mods(120, args.seed), args.steps, args.seed)
+    bench(make_mods(args.mods, args.seed), 200, args.seed)
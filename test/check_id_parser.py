@@ -0,0 +1,48 @@
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Code.package.id_parser import extract_ids, extract_ids_from_events  # noqa: E402
+from Code.xml_object import XMLBuilder  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_DIRS = [ROOT / "examples" / "example mod", ROOT / "Data" / "InternalLibrary"]
+
+
+def check_file(path: Path) -> bool:
+    tree_ids = extract_ids(XMLBuilder.load(path))
+    event_ids = extract_ids_from_events(XMLBuilder.iter_events(path))
+
+    if event_ids is None:
+        return not tree_ids.add_id and not tree_ids.override_id
+
+    return (
+        tree_ids.add_id == event_ids.add_id
+        and tree_ids.override_id == event_ids.override_id
+    )
+
+
+def main() -> int:
+    # The rule table warns about every unknown tag, metadata files are full of them.
+    logging.disable(logging.WARNING)
+
+    dirs = [Path(arg) for arg in sys.argv[1:]] or DEFAULT_DIRS
+    checked = 0
+    failed = []
+    for directory in dirs:
+        for path in sorted(directory.rglob("*.[Xx][Mm][Ll]")):
+            checked += 1
+            if not check_file(path):
+                failed.append(path)
+
+    for path in failed:
+        print(f"ID mismatch: {path}")
+
+    print(f"Checked {checked} files, {len(failed)} mismatches")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
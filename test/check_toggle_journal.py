@@ -0,0 +1,66 @@
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Code.app_vars import AppConfig  # noqa: E402
+from Code.handlers.parts_manager import PartsManager  # noqa: E402
+from Code.handlers.toggle_journal import ToggleJournal  # noqa: E402
+from Code.handlers.toggle_regions import ToggleChange  # noqa: E402
+
+SHIPPED = b"""<Items>
+  <!-- BTM: setState="on": start -->
+  <Item identifier="a" />
+  <!-- BTM: end -->
+</Items>
+"""
+
+
+def reset_journal(user_data_path: Path) -> None:
+    AppConfig._user_data_path = user_data_path
+    ToggleJournal._files = {}
+    ToggleJournal._configs = {}
+    ToggleJournal._renames = {}
+    ToggleJournal._loaded = False
+
+
+def switched_off(path: Path) -> ToggleChange:
+    return ToggleChange("mod", path, 0, 0, 'BTM: setState="on": start', True, False)
+
+
+def check_missing_file(root: Path) -> None:
+    # A mod deleted while its file was switched must not stay journaled.
+    present = root / "present.xml"
+    present.write_bytes(SHIPPED)
+    missing = root / "missing.xml"
+
+    changes = [switched_off(present), switched_off(missing)]
+    ToggleJournal.record(changes, {}, is_fix=False)
+    PartsManager._apply_file(present, [changes[0]])
+    assert present.read_bytes() != SHIPPED
+
+    results = PartsManager.rollback_journal()
+    assert all(result.ok for result in results), results
+    assert present.read_bytes() == SHIPPED
+    assert ToggleJournal.is_empty()
+
+    reset_journal(root)
+    assert ToggleJournal.is_empty(), "the journal file was kept"
+    print("Missing journaled file dropped")
+
+
+def main() -> int:
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        reset_journal(root)
+        check_missing_file(root)
+
+    PartsManager.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())